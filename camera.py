@@ -1,44 +1,49 @@
 import random
 import traci
-import sumolib
 import math
 
+from net_arrays import open_net
+
 class IntersectionCamera:
-    def __init__(self, net_file="intersection.net.xml", detection_distance=50):
+    def __init__(self, net_file="intersection.net.xml", detection_distance=50, edge_level=False, seed=None):
         self.detection_distance = detection_distance
+        # Own generator for the sensor noise, so a seeded env gives repeatable observations
+        self.rng = random.Random(seed)
+        # Query vehicles per edge instead of per lane (needed for mesoscopic runs)
+        self.edge_level = edge_level
         self.directions = ["North", "South", "East", "West"]
         self.lane_map = {d: [] for d in self.directions}
+        # Static lane data from the net file, so get_state does not ask TraCI every step
+        self.lane_length = {}
+        self.lane_edge = {}
         
         # Parse net to find incoming lanes and classify them
-        try:
-            net = sumolib.net.readNet(net_file)
-        except Exception as e:
-            print(f"Error reading net file {net_file}: {e}")
-            return
+        # (memory-mapped arrays shared by every process using this net).
+        # Errors propagate: a camera without lanes would silently observe zeros
+        net = open_net(net_file)
 
         # Find the central junction (node with most edges or simply the one connecting our arms)
         # In a spider net with arm-number=4, there is one center junction.
-        nodes = net.getNodes()
         junction = None
-        for n in nodes:
+        for n in range(net.n_nodes):
             # The center node usually has incoming edges from all directions
-            if len(n.getIncoming()) >= 3:
+            if len(net.incoming_edges(n)) >= 3:
                 junction = n
                 break
         
-        if not junction:
+        if junction is None:
             print("Error: Could not find central junction in network.")
             return
 
-        print(f"Intersection Camera initialized at junction: {junction.getID()}")
+        print(f"Intersection Camera initialized at junction: {net.node_ids[junction]}")
 
 
-        for edge in junction.getIncoming():
+        for edge in net.incoming_edges(junction):
             # Get angle of the edge (direction of traffic flow)
-            # sumolib Edge doesn't have getAngle(), calculate from shape or nodes.
-            # edge.getShape() returns [(x1,y1), (x2,y2), ...]
-            shape = edge.getShape()
-            if not shape or len(shape) < 2:
+            # The net has no edge angle, calculate from shape or nodes.
+            # edge_shape_xy() returns [[x1,y1], [x2,y2], ...]
+            shape = net.edge_shape_xy(edge)
+            if len(shape) < 2:
                 continue
                 
             # Vector from start to end of the edge (or last segment)
@@ -89,30 +94,51 @@ class IntersectionCamera:
             angle = math_angle 
                 
             if direction:
-                lanes = edge.getLanes()
-                lane_ids = [l.getID() for l in lanes]
+                lane_ids = net.edge_lane_ids(edge)
                 self.lane_map[direction].extend(lane_ids)
+                for lane_id in lane_ids:
+                    self.lane_length[lane_id] = net.lane_length_of(lane_id)
+                    self.lane_edge[lane_id] = str(net.edge_ids[edge])
                 print(f"Mapped lanes {lane_ids} to direction {direction} (Angle: {angle:.1f})")
 
-    def get_state(self):
+    def seed(self, seed):
+        """Reseeds the sensor noise."""
+        self.rng.seed(seed)
+
+    def _sensed_lanes(self, direction):
+        lanes = self.lane_map[direction]
+        if not self.edge_level:
+            return lanes
+        # One representative lane per edge, so multi-lane edges are not counted twice
+        seen = {}
+        for lane_id in lanes:
+            seen.setdefault(lane_id.rsplit("_", 1)[0], lane_id)
+        return list(seen.values())
+
+    def get_state(self, conn=None):
         """
         Returns a state vector: [North_Density, South_Density, East_Density, West_Density].
         Counts cars within detection_distance of the stop bar.
         Adds 5% Gaussian noise.
+        conn is the TraCI connection to read from (default: the current one).
         """
+        conn = conn or traci
         state = []
         for d in self.directions:
             count = 0
-            for lane_id in self.lane_map[d]:
+            for lane_id in self._sensed_lanes(d):
                 try:
                     # Get length of lane
-                    length = traci.lane.getLength(lane_id)
-                    # Get vehicles on lane
-                    vehs = traci.lane.getLastStepVehicleIDs(lane_id)
+                    length = self.lane_length[lane_id]
+                    # Get vehicles on lane (or on the whole edge in edge-level mode)
+                    if self.edge_level:
+                        vehs = conn.edge.getLastStepVehicleIDs(self.lane_edge[lane_id])
+                    else:
+                        vehs = conn.lane.getLastStepVehicleIDs(lane_id)
                     
                     for veh in vehs:
                         try:
-                            pos = traci.vehicle.getLanePosition(veh)
+                            pos = conn.vehicle.getLanePosition(veh)
                             # Stop bar is at the end of the lane (pos = length)
                             # Distance to stop bar = length - pos
                             if (length - pos) <= self.detection_distance:
@@ -127,7 +153,7 @@ class IntersectionCamera:
             # Interpreting "5% Gaussian noise" as noise with std_dev = 0.05 * count
             # This makes the error proportional to the count.
             if count > 0:
-                noise = random.gauss(0, 0.05 * count)
+                noise = self.rng.gauss(0, 0.05 * count)
                 count += noise
             
             # Ensure non-negative
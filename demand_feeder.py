@@ -0,0 +1,296 @@
+import gzip
+import heapq
+import math
+import xml.etree.ElementTree as ET
+import traci
+
+# vType attributes we can forward through traci.vehicletype setters.
+# Anything not listed here is ignored (SUMO falls back to the default type).
+VTYPE_SETTERS = {
+    "accel": "setAccel",
+    "decel": "setDecel",
+    "sigma": "setImperfection",
+    "tau": "setTau",
+    "length": "setLength",
+    "minGap": "setMinGap",
+    "maxSpeed": "setMaxSpeed",
+    "speedFactor": "setSpeedFactor",
+    "vClass": "setVehicleClass",
+    "guiShape": "setShapeClass",
+    "color": "setColor",
+}
+
+# Insertion attributes forwarded to traci.vehicle.add, with SUMO's defaults
+VEHICLE_ADD_ATTRS = {
+    "departLane": "first",
+    "departPos": "base",
+    "departSpeed": "0",
+    "arrivalLane": "current",
+    "arrivalPos": "max",
+    "arrivalSpeed": "current",
+}
+
+# SUMO's default end of a <flow> without one (24 h)
+FLOW_DEFAULT_END = 86400.0
+FLOW_ATTRS = ("begin", "end", "number", "period", "vehsPerHour", "probability")
+
+
+def _open_xml(path):
+    # SUMO happily reads .xml.gz, so we do too
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_route_file(route_file):
+    """
+    Lazily yields demand entries from a SUMO route file in departure order.
+    Each entry is a dict with a 'kind' key: 'vType', 'route', 'vehicle' or 'trip'.
+    <flow> elements are expanded into their vehicles as the stream reaches
+    each departure (see _expand_flows).
+    Elements are cleared as soon as they are consumed, so memory stays flat
+    no matter how many vehicles the file holds.
+    """
+    return _expand_flows(_iter_elements(route_file))
+
+
+def _iter_elements(route_file):
+    with _open_xml(route_file) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        depth = 0
+        for event, elem in context:
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            # Only top-level children of <routes> are demand entries.
+            # Nested <route> elements belong to their vehicle.
+            if depth != 0:
+                continue
+
+            entry = dict(elem.attrib)
+            entry["kind"] = elem.tag
+            if elem.tag in ("vehicle", "flow"):
+                inline_route = elem.find("route")
+                if inline_route is not None:
+                    entry["edges"] = inline_route.get("edges", "").split()
+            elif elem.tag == "route":
+                entry["edges"] = elem.get("edges", "").split()
+
+            if elem.tag in ("vType", "route", "vehicle", "trip", "flow"):
+                yield entry
+
+            # Drop the element (and anything the root still references)
+            elem.clear()
+            root.clear()
+
+
+def _flow_schedule(flow):
+    """(begin, period, count limit, end) of a flow, following SUMO's rules."""
+    flow_id = flow.get("id")
+    if "probability" in flow:
+        raise ValueError(f"<flow id='{flow_id}'>: probability flows are random and not supported, "
+                         "use period, vehsPerHour or number")
+    try:
+        begin = float(flow.get("begin", 0))
+        end = float(flow.get("end", FLOW_DEFAULT_END))
+        number = int(flow["number"]) if "number" in flow else None
+        if "period" in flow:
+            period = float(flow["period"])
+        elif "vehsPerHour" in flow:
+            period = 3600.0 / float(flow["vehsPerHour"])
+        elif number is not None:
+            # number alone spreads the vehicles evenly over [begin, end)
+            period = (end - begin) / number if number else 0.0
+        else:
+            raise ValueError("needs one of period, vehsPerHour or number")
+    except ValueError as e:
+        raise ValueError(f"<flow id='{flow_id}'>: {e}") from e
+    if period <= 0 and number is None:
+        raise ValueError(f"<flow id='{flow_id}'>: period must be positive")
+    return begin, period, number, end
+
+
+def _flow_vehicle(flow, index, depart):
+    entry = {k: v for k, v in flow.items() if k not in FLOW_ATTRS}
+    entry["id"] = f"{flow['id']}.{index}"
+    entry["depart"] = f"{depart:.2f}"
+    # Flows with from/to are trips, everything else has a route
+    entry["kind"] = "trip" if "from" in flow and "route" not in flow and "edges" not in flow else "vehicle"
+    return entry
+
+
+def _expand_flows(entries):
+    """
+    Merges the vehicles of <flow> entries into the stream in departure order.
+    Only flows that have begun and not yet ended are held, each as a
+    (next depart, index) pair, so a multi-hour flow costs constant memory.
+    """
+    active = []
+    order = 0
+
+    def due(upto):
+        while active and active[0][0] <= upto:
+            depart, seq, index, flow, schedule = heapq.heappop(active)
+            yield _flow_vehicle(flow, index, depart)
+            begin, period, number, end = schedule
+            index += 1
+            next_depart = begin + index * period
+            if (number is None or index < number) and next_depart < end:
+                heapq.heappush(active, (next_depart, seq, index, flow, schedule))
+
+    for entry in entries:
+        kind = entry["kind"]
+        if kind == "flow":
+            schedule = _flow_schedule(entry)
+            begin, _, number, end = schedule
+            yield from due(begin)
+            if begin < end and number != 0:
+                heapq.heappush(active, (begin, order, 0, entry, schedule))
+                order += 1
+            continue
+        if kind in ("vehicle", "trip"):
+            try:
+                yield from due(float(entry.get("depart", 0)))
+            except ValueError:
+                # "triggered", "now" etc.: no time to order by
+                pass
+        yield entry
+    yield from due(math.inf)
+
+
+class DemandFeeder:
+    """
+    Injects vehicles into a running SUMO just-in-time instead of loading the
+    whole route file at startup.
+
+    The source is either a path to a route file or any iterable of entry dicts
+    (same shape as iter_route_file yields), e.g. a demand generator.
+    Entries must be sorted by departure time, as SUMO itself expects.
+    Only `window` seconds of demand ahead of the simulation clock are ever
+    handed to SUMO, so startup cost does not grow with demand length.
+    """
+    def __init__(self, source, window=60.0):
+        self.source = source
+        self.window = window
+        # TraCI connection to inject into (the traci module itself = current connection)
+        self.conn = traci
+        self._entries = None
+        self._pending = None
+        self.exhausted = False
+        self.injected = 0
+
+    def reset(self, start_time=0.0, conn=None):
+        """
+        Restart the stream. Vehicles departing before start_time are skipped.
+        conn is the TraCI connection of the (re)started simulation, if not the current one.
+        """
+        if conn is not None:
+            self.conn = conn
+        if isinstance(self.source, str):
+            self._entries = iter_route_file(self.source)
+        else:
+            self._entries = iter(self.source)
+        self._pending = None
+        self.exhausted = False
+        self.injected = 0
+        self.start_time = start_time
+        self._known_types = set()
+        self._known_routes = set()
+
+    def update(self, sim_time):
+        """
+        Adds every vehicle departing before sim_time + window.
+        Call once right after SUMO starts and again after each simulation step.
+        """
+        if self._entries is None:
+            self.reset()
+
+        horizon = sim_time + self.window
+        while not self.exhausted:
+            if self._pending is None:
+                try:
+                    self._pending = next(self._entries)
+                except StopIteration:
+                    self.exhausted = True
+                    break
+
+            entry = self._pending
+            if entry["kind"] in ("vehicle", "trip"):
+                depart = self._depart_time(entry)
+                if depart is not None and depart > horizon:
+                    # Keep it for a later step
+                    break
+                if depart is None:
+                    self._add_vehicle(entry, sim_time)
+                elif depart >= self.start_time:
+                    # SUMO rejects departures in the past
+                    self._add_vehicle(entry, max(depart, sim_time))
+            elif entry["kind"] == "vType":
+                self._add_vtype(entry)
+            elif entry["kind"] == "route":
+                self._add_route(entry["id"], entry["edges"])
+
+            self._pending = None
+
+    def _depart_time(self, entry):
+        try:
+            return float(entry.get("depart", 0))
+        except ValueError:
+            # "triggered", "containerTriggered", "now" etc. are inserted immediately
+            return None
+
+    def _add_vtype(self, entry):
+        type_id = entry["id"]
+        if type_id in self._known_types:
+            return
+        try:
+            self.conn.vehicletype.copy("DEFAULT_VEHTYPE", type_id)
+        except traci.exceptions.TraCIException:
+            # Type already exists in the net/additional files
+            pass
+        for attr, setter in VTYPE_SETTERS.items():
+            if attr not in entry:
+                continue
+            value = entry[attr]
+            try:
+                if attr in ("vClass", "guiShape"):
+                    getattr(self.conn.vehicletype, setter)(type_id, value)
+                elif attr == "color":
+                    rgba = tuple(int(c) for c in value.split(","))
+                    getattr(self.conn.vehicletype, setter)(type_id, rgba if len(rgba) == 4 else rgba + (255,))
+                else:
+                    getattr(self.conn.vehicletype, setter)(type_id, float(value))
+            except (ValueError, traci.exceptions.TraCIException) as e:
+                print(f"Warning: could not set {attr}={value} on vType {type_id}: {e}")
+        self._known_types.add(type_id)
+
+    def _add_route(self, route_id, edges):
+        if route_id in self._known_routes:
+            return
+        self.conn.route.add(route_id, edges)
+        self._known_routes.add(route_id)
+
+    def _add_vehicle(self, entry, depart):
+        veh_id = entry["id"]
+        type_id = entry.get("type", "DEFAULT_VEHTYPE")
+        insertion = {attr: entry.get(attr, default) for attr, default in VEHICLE_ADD_ATTRS.items()}
+        try:
+            if entry["kind"] == "trip":
+                # Let SUMO route the trip: start on the origin edge, then retarget
+                route_id = f"!{veh_id}"
+                self.conn.route.add(route_id, [entry["from"]])
+                self.conn.vehicle.add(veh_id, route_id, typeID=type_id, depart=str(depart), **insertion)
+                self.conn.vehicle.changeTarget(veh_id, entry["to"])
+            else:
+                if "edges" in entry:
+                    # Inline routes are unique per vehicle, no need to remember them
+                    route_id = f"!{veh_id}"
+                    self.conn.route.add(route_id, entry["edges"])
+                else:
+                    route_id = entry["route"]
+                self.conn.vehicle.add(veh_id, route_id, typeID=type_id, depart=str(depart), **insertion)
+            self.injected += 1
+        except (KeyError, traci.exceptions.TraCIException) as e:
+            print(f"Warning: could not inject vehicle {veh_id}: {e}")
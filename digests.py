@@ -0,0 +1,20 @@
+import hashlib
+import os
+
+# File content hashes shared by the result cache and the network arrays.
+
+_digests = {}
+
+
+def file_digest(path):
+    """sha256 of a file's bytes, remembered per (path, size, mtime) within the process."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _digests[memo_key] = h.hexdigest()
+    return digest
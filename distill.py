@@ -0,0 +1,193 @@
+import argparse
+import time
+
+import numpy as np
+
+from sumo_setup import ensure_sumo
+
+ensure_sumo()
+
+from numpy_policy import load_policy
+from step4_evaluate import run_simulation_metrics
+from distilled_controller import DistilledController, FEATURES, features
+
+# Distils a trained policy into a small decision tree for field controllers.
+#
+# 1. Roll out the teacher and record (observation, phase, teacher action).
+#    A fraction of steps execute a random action instead, so the data also
+#    covers states the teacher itself would not drive into; every state is
+#    still labelled with the teacher's choice.
+# 2. Fit a CART tree (Gini) on the camera counts, the phase and the NS/EW pressures.
+# 3. Report agreement on held-out steps, step4-style metrics for both
+#    controllers and per-decision latency, then save the tree as JSON.
+#
+#   python distill.py --model flowstate_ppo_model --max-depth 8 -o flowstate_tree.json
+
+
+def collect(teacher, steps, net_file="intersection.net.xml", route_file="traffic.rou.xml", sim_mode="micro",
+            explore=0.1, seed=0):
+    """Returns (X, y): feature rows (see FEATURES) and the teacher's action for each."""
+    from traffic_env import TrafficLightEnv
+
+    rng = np.random.default_rng(seed)
+    env = TrafficLightEnv(net_file=net_file, route_file=route_file, use_gui=False, sim_mode=sim_mode)
+    # Only observations are needed, not the reward
+    env.compute_reward = False
+    rows, labels = [], []
+    try:
+        obs, _ = env.reset(seed=seed)
+        while len(rows) < steps:
+            phase = env.current_phase()
+            action, _ = teacher.predict(obs, deterministic=True)
+            rows.append(features(obs, phase))
+            labels.append(int(action))
+            if rng.random() < explore:
+                action = int(rng.integers(env.action_space.n))
+            obs, _, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                obs, _ = env.reset()
+    finally:
+        env.close()
+    return np.array(rows, dtype=np.float64), np.array(labels, dtype=np.int64)
+
+
+def _best_split(X, y, n_classes, min_leaf):
+    """Lowest weighted Gini split as (impurity, feature, threshold), or None."""
+    n = len(y)
+    onehot = np.eye(n_classes)[y]
+    best = None
+    for f in range(X.shape[1]):
+        order = np.argsort(X[:, f], kind="stable")
+        xs = X[order, f]
+        left_counts = np.cumsum(onehot[order], axis=0)[:-1]
+        right_counts = left_counts[-1] + onehot[order[-1]] - left_counts
+        n_left = np.arange(1, n)
+        n_right = n - n_left
+        # Split only between distinct values, leaving min_leaf samples on each side
+        valid = (xs[1:] != xs[:-1]) & (n_left >= min_leaf) & (n_right >= min_leaf)
+        if not valid.any():
+            continue
+        gini_left = 1.0 - ((left_counts / n_left[:, None]) ** 2).sum(axis=1)
+        gini_right = 1.0 - ((right_counts / n_right[:, None]) ** 2).sum(axis=1)
+        impurity = np.where(valid, (n_left * gini_left + n_right * gini_right) / n, np.inf)
+        i = int(impurity.argmin())
+        if best is None or impurity[i] < best[0]:
+            best = (float(impurity[i]), f, float((xs[i] + xs[i + 1]) / 2))
+    return best
+
+
+def fit_tree(X, y, max_depth=8, min_leaf=20):
+    """CART classifier as flat arrays (feature -1 marks a leaf)."""
+    n_classes = int(y.max()) + 1 if len(y) else 1
+    tree = {"features": FEATURES, "feature": [], "threshold": [], "left": [], "right": [], "value": [],
+            "samples": []}
+
+    def add_node():
+        for key in ("feature", "threshold", "left", "right", "value", "samples"):
+            tree[key].append(-1 if key != "threshold" else 0.0)
+        return len(tree["feature"]) - 1
+
+    def build(idx, depth):
+        node = add_node()
+        counts = np.bincount(y[idx], minlength=n_classes)
+        tree["value"][node] = int(counts.argmax())
+        tree["samples"][node] = int(len(idx))
+        gini = 1.0 - ((counts / len(idx)) ** 2).sum()
+        if depth >= max_depth or gini == 0.0 or len(idx) < 2 * min_leaf:
+            return node
+        split = _best_split(X[idx], y[idx], n_classes, min_leaf)
+        if split is None or split[0] >= gini:
+            return node
+        _, f, threshold = split
+        go_left = X[idx, f] <= threshold
+        tree["feature"][node] = f
+        tree["threshold"][node] = threshold
+        tree["left"][node] = build(idx[go_left], depth + 1)
+        tree["right"][node] = build(idx[~go_left], depth + 1)
+        return node
+
+    build(np.arange(len(y)), 0)
+    return tree
+
+
+def agreement(controller, X, y):
+    """Fraction of rows where the tree picks the teacher's action, overall and per phase."""
+    phase_col = FEATURES.index("phase")
+    predicted = np.array([controller.predict_with_phase(row[:4], row[phase_col]) for row in X])
+    match = predicted == y
+    per_phase = {int(p): float(match[X[:, phase_col] == p].mean()) for p in np.unique(X[:, phase_col])}
+    return float(match.mean()) if len(y) else float("nan"), per_phase
+
+
+def latency_us(predict, observations, repeats=3):
+    """Best-of-repeats mean microseconds per predict call."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for obs in observations:
+            predict(obs)
+        best = min(best, (time.perf_counter() - t0) / len(observations))
+    return best * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distil a trained policy into a dependency-free decision tree.")
+    parser.add_argument("--model", default="flowstate_ppo_model", help="Teacher: SB3 model zip or exported .npz")
+    parser.add_argument("-o", "--output", default="flowstate_tree.json")
+    parser.add_argument("--steps", type=int, default=20000, help="Teacher decisions to record")
+    parser.add_argument("--explore", type=float, default=0.1, help="Fraction of steps that take a random action")
+    parser.add_argument("--max-depth", type=int, default=8)
+    parser.add_argument("--min-leaf", type=int, default=20)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Last fraction of steps kept for the agreement check")
+    parser.add_argument("--sim-mode", choices=["micro", "meso"], default="micro")
+    parser.add_argument("--skip-eval", action="store_true", help="Skip the step4-style closed-loop evaluation")
+    args = parser.parse_args(argv)
+    from traffic_env import TrafficLightEnv
+
+    teacher = load_policy(args.model)
+    print(f"Recording {args.steps} teacher decisions...")
+    X, y = collect(teacher, args.steps, sim_mode=args.sim_mode, explore=args.explore)
+    # Split by time, so held-out steps are not neighbours of training steps
+    split = int(len(y) * (1 - args.holdout))
+    tree = fit_tree(X[:split], y[:split], max_depth=args.max_depth, min_leaf=args.min_leaf)
+    tree["teacher"] = str(args.model)
+    student = DistilledController(tree)
+    student.save(args.output)
+    leaves = sum(1 for f in tree["feature"] if f < 0)
+    print(f"Saved {args.output}: {student.n_nodes} nodes, {leaves} leaves")
+
+    train_acc, _ = agreement(student, X[:split], y[:split])
+    test_acc, per_phase = agreement(student, X[split:], y[split:])
+
+    phase_col = FEATURES.index("phase")
+    held_out = [(row[:4].astype(np.float32), row[phase_col]) for row in X[split:]] or [(X[0, :4], X[0, phase_col])]
+    teacher_us = latency_us(lambda o: teacher.predict(o[0], deterministic=True), held_out)
+    student_us = latency_us(lambda o: student.predict_with_phase(o[0], o[1]), held_out)
+
+    results = {}
+    if not args.skip_eval:
+        for label, controller in (("Teacher", teacher), ("Tree", DistilledController(tree))):
+            env = TrafficLightEnv(use_gui=False, sim_mode=args.sim_mode)
+            avg_wait, co2, max_queue, throughput, collector = run_simulation_metrics(env, model=controller, label=label)
+            results[label] = {"avg_wait": avg_wait, "p95_wait": collector.summary("delay")["p95"],
+                              "max_queue": max_queue, "throughput": throughput}
+            env.close()
+
+    print("\n" + "=" * 60)
+    print("             DISTILLATION REPORT")
+    print("=" * 60)
+    print(f"Agreement with teacher: {train_acc:.1%} (train), {test_acc:.1%} (held out)")
+    for phase, acc in sorted(per_phase.items()):
+        print(f"  phase {phase}: {acc:.1%}")
+    print(f"Latency per decision: teacher {teacher_us:.1f} us, tree {student_us:.2f} us")
+    if results:
+        print("-" * 60)
+        print(f"{'Metric':<20} | {'Teacher':<12} | {'Tree':<12}")
+        for key, name in (("avg_wait", "Avg Wait Time"), ("p95_wait", "P95 Wait Time"),
+                          ("max_queue", "Max Queue Length"), ("throughput", "Total Throughput")):
+            print(f"{name:<20} | {results['Teacher'][key]:<12.2f} | {results['Tree'][key]:<12.2f}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import json
+
+# Decision-tree controller distilled from a trained policy (see distill.py).
+#
+# Standard library only: no NumPy, no torch, no SUMO needed to make decisions,
+# so it runs on the low-power field boxes. The tree is stored as flat JSON
+# arrays and evaluated with a short loop, a few microseconds per decision.
+
+# Inputs the tree can split on, in order
+FEATURES = ["north", "south", "east", "west", "phase", "ns_pressure", "ew_pressure"]
+
+
+def features(obs, phase):
+    north, south, east, west = float(obs[0]), float(obs[1]), float(obs[2]), float(obs[3])
+    return (north, south, east, west, phase, north + south, east + west)
+
+
+def bind_phase(policy, env):
+    """Points a policy that reads the phase (DistilledController) at env's traffic light; others are left alone."""
+    if getattr(policy, "needs_phase", False):
+        policy.phase_fn = env.current_phase
+    return policy
+
+
+class DistilledController:
+    """
+    Same predict() interface as SmartController and the SB3 model, including
+    2-D batches of observations.
+    The current phase is not part of the camera observation, so it is passed
+    as phases= or read from phase_fn: in simulation the env's traffic light
+    (bind_phase), on a field box a function reading the signal controller's
+    own state.
+    """
+    # Tells runners to supply the phase (bind_phase or phases=)
+    needs_phase = True
+
+    def __init__(self, tree, phase_fn=None):
+        if tree.get("features", FEATURES) != FEATURES:
+            raise ValueError(f"Tree was fitted on features {tree['features']}, expected {FEATURES}")
+        self.tree = tree
+        self._feature = list(tree["feature"])
+        self._threshold = [float(t) for t in tree["threshold"]]
+        self._left = list(tree["left"])
+        self._right = list(tree["right"])
+        self._value = list(tree["value"])
+        self.phase_fn = phase_fn
+
+    @classmethod
+    def load(cls, path, phase_fn=None):
+        with open(path) as f:
+            return cls(json.load(f), phase_fn=phase_fn)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.tree, f)
+
+    @property
+    def n_nodes(self):
+        return len(self._feature)
+
+    def predict_with_phase(self, obs, phase):
+        x = features(obs, phase)
+        feature, threshold, left, right = self._feature, self._threshold, self._left, self._right
+        node = 0
+        # Internal nodes have a feature index, leaves have -1
+        while feature[node] >= 0:
+            node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+        return self._value[node]
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True, phases=None):
+        """
+        obs is one observation or a batch of them. phases is the current phase,
+        one per observation for a batch; phase_fn() is used when it is omitted.
+        """
+        if phases is None:
+            if self.phase_fn is None:
+                raise ValueError("DistilledController needs the current phase: pass phases= or set phase_fn")
+            phases = self.phase_fn()
+        if len(obs) and hasattr(obs[0], "__len__"):
+            if not hasattr(phases, "__len__") or len(phases) != len(obs):
+                raise ValueError(f"A batch of {len(obs)} observations needs one phase per observation")
+            return [self.predict_with_phase(o, p) for o, p in zip(obs, phases)], state
+        return self.predict_with_phase(obs, phases), state
@@ -0,0 +1,135 @@
+import argparse
+import math
+import time
+
+from sumo_setup import ensure_sumo
+
+ensure_sumo()
+
+from step4_evaluate import run_simulation_metrics
+from numpy_policy import ZeroPolicy, load_policy
+from distilled_controller import bind_phase
+
+# Fidelity report: how far does the mesoscopic model drift from the exact
+# microscopic one, and how much faster is it?
+#
+# 1. Open-loop replay: run micro with a controller, record its actions, then
+#    replay exactly those actions in meso. Observations and rewards are compared
+#    step by step, so differences come from the simulation model alone.
+# 2. Closed-loop evaluation: the usual step4 metrics in both modes.
+#
+#   python fidelity.py --model flux_policy.npz
+
+
+def record_rollout(env, model, max_steps, actions=None):
+    """
+    Runs one episode. With actions=None the model decides and its actions are
+    recorded; otherwise the given actions are replayed.
+    Returns (actions, observations, rewards, wall seconds).
+    """
+    obs, info = env.reset(seed=0)
+    bind_phase(model, env)
+    recorded, observations, rewards = [], [], []
+    t0 = time.perf_counter()
+    for step in range(max_steps):
+        if actions is None:
+            action, _ = model.predict(obs, deterministic=True)
+        else:
+            if step >= len(actions):
+                break
+            action = actions[step]
+        obs, reward, terminated, truncated, info = env.step(action)
+        recorded.append(int(action))
+        observations.append([float(x) for x in obs])
+        rewards.append(float(reward))
+        if terminated or truncated:
+            break
+    return recorded, observations, rewards, time.perf_counter() - t0
+
+
+def _correlation(a, b):
+    n = min(len(a), len(b))
+    if n < 2:
+        return math.nan
+    a, b = a[:n], b[:n]
+    mean_a, mean_b = sum(a) / n, sum(b) / n
+    cov = sum((x - mean_a) * (y - mean_b) for x, y in zip(a, b))
+    var_a = sum((x - mean_a) ** 2 for x in a)
+    var_b = sum((y - mean_b) ** 2 for y in b)
+    if var_a == 0 or var_b == 0:
+        return math.nan
+    return cov / math.sqrt(var_a * var_b)
+
+
+def _relative(a, b):
+    return (b - a) / abs(a) * 100 if a else math.nan
+
+
+def fidelity_report(model=None, max_steps=2000, net_file="intersection.net.xml", route_file="traffic.rou.xml"):
+    from traffic_env import TrafficLightEnv
+
+    model = model or ZeroPolicy()
+
+    def make_env(mode):
+        return TrafficLightEnv(net_file=net_file, route_file=route_file, use_gui=False, sim_mode=mode)
+
+    print("Open-loop replay (micro actions replayed in meso)...")
+    env = make_env("micro")
+    actions, micro_obs, micro_rew, micro_time = record_rollout(env, model, max_steps)
+    env.close()
+    env = make_env("meso")
+    _, meso_obs, meso_rew, meso_time = record_rollout(env, model, max_steps, actions=actions)
+    env.close()
+
+    n = min(len(micro_obs), len(meso_obs))
+    directions = ["North", "South", "East", "West"]
+    obs_mae = [sum(abs(micro_obs[t][i] - meso_obs[t][i]) for t in range(n)) / max(n, 1) for i in range(4)]
+    obs_corr = [_correlation([o[i] for o in micro_obs], [o[i] for o in meso_obs]) for i in range(4)]
+
+    print("Closed-loop evaluation in both modes...")
+    results = {}
+    for mode in ("micro", "meso"):
+        env = make_env(mode)
+        t0 = time.perf_counter()
+        avg_wait, co2, max_queue, throughput, _ = run_simulation_metrics(env, model=model, label=f"Eval ({mode})")
+        results[mode] = {"avg_wait": avg_wait, "co2": co2, "max_queue": max_queue,
+                         "throughput": throughput, "wall_s": time.perf_counter() - t0}
+        env.close()
+
+    print("\n" + "=" * 70)
+    print("             MESO vs MICRO FIDELITY REPORT")
+    print("=" * 70)
+    print(f"Replayed {n} decisions. Micro {micro_time:.2f}s, meso {meso_time:.2f}s "
+          f"({micro_time / meso_time if meso_time else math.nan:.1f}x faster)")
+    print("-" * 70)
+    print(f"{'Observation':<20} | {'MAE (veh)':<10} | {'Correlation':<12}")
+    for d, mae, corr in zip(directions, obs_mae, obs_corr):
+        print(f"{d:<20} | {mae:<10.2f} | {corr:<12.3f}")
+    micro_total, meso_total = sum(micro_rew[:n]), sum(meso_rew[:n])
+    print(f"{'Reward (per step)':<20} | {'corr':<10} | {_correlation(micro_rew, meso_rew):<12.3f}")
+    print(f"{'Reward (episode)':<20} | {micro_total:<10.1f} | {meso_total:<12.1f} ({_relative(micro_total, meso_total):+.1f}%)")
+    print("-" * 70)
+    print(f"{'Metric':<20} | {'Micro':<12} | {'Meso':<12} | {'Difference':<10}")
+    for key, name in (("avg_wait", "Avg Wait Time"), ("co2", "Total CO2"), ("max_queue", "Max Queue Length"),
+                      ("throughput", "Total Throughput"), ("wall_s", "Wall time (s)")):
+        a, b = results["micro"][key], results["meso"][key]
+        print(f"{name:<20} | {a:<12.2f} | {b:<12.2f} | {_relative(a, b):+.1f}%")
+    print("=" * 70)
+
+    return {"obs_mae": dict(zip(directions, obs_mae)), "obs_corr": dict(zip(directions, obs_corr)),
+            "reward_corr": _correlation(micro_rew, meso_rew), "episode_reward": (micro_total, meso_total),
+            "replay_speedup": micro_time / meso_time if meso_time else math.nan, "eval": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare mesoscopic against microscopic simulation fidelity.")
+    parser.add_argument("--model", default=None,
+                        help="Policy to drive both runs (SB3 zip or exported .npz). Default: SUMO's fixed-time program")
+    parser.add_argument("--max-steps", type=int, default=2000)
+    args = parser.parse_args(argv)
+    model = load_policy(args.model) if args.model else None
+    fidelity_report(model=model, max_steps=args.max_steps)
+
+
+if __name__ == "__main__":
+    main()
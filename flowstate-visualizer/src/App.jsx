@@ -3,6 +3,7 @@ import { Canvas, useFrame } from '@react-three/fiber';
 import { OrbitControls, Environment, ContactShadows, Float, Stars } from '@react-three/drei';
 import { EffectComposer, Bloom, Vignette } from '@react-three/postprocessing';
 import * as THREE from 'three';
+import { mergeGeometries } from 'three/examples/jsm/utils/BufferGeometryUtils.js';
 
 // --- CONFIGURATION ---
 const LANE_WIDTH = 4;
@@ -247,6 +248,67 @@ const Scenery = () => {
   );
 };
 
+// --- SHARED TRAFFIC RULES ---
+// Used by both the classic (per-car component) and instanced render modes.
+
+const STOP_LINE_DIST = 12; // Visual stop line location
+
+// Signal state for the current time. emergencyLane is the lane of an ambulance
+// on screen (or null); in FLUX mode it preempts the cycle.
+const computeLights = (mode, t, emergencyLane, aiState) => {
+  if (emergencyLane !== null && mode === 'flux') {
+    // PREEMPTION: Force Green for Ambulance
+    // Reset AI timer so it doesn't switch immediately after
+    aiState.lastSwitch = t;
+    if (emergencyLane < 2) return { nsColor: 'green', ewColor: 'red' };
+    return { nsColor: 'red', ewColor: 'green' };
+  }
+  if (mode === 'baseline') {
+    // BASELINE: Fixed 14s Cycle (Blind Timer)
+    const cycle = (t % 14);
+    if (cycle < 6) return { nsColor: 'green', ewColor: 'red' };
+    if (cycle < 7) return { nsColor: 'yellow', ewColor: 'red' };
+    if (cycle < 13) return { nsColor: 'red', ewColor: 'green' };
+    return { nsColor: 'red', ewColor: 'yellow' };
+  }
+  // FLUX AI: Safe Fast Cycle (Green Wave Effect)
+  // Reverted sensor logic to ensure continuous flow without deadlocks.
+  // 5s Total Cycle: 2s Green, 0.5s Yellow, 2.5s Red
+  const cycle = (t % 5);
+  if (cycle < 2.0) return { nsColor: 'green', ewColor: 'red' };
+  if (cycle < 2.5) return { nsColor: 'yellow', ewColor: 'red' };
+  if (cycle < 4.5) return { nsColor: 'red', ewColor: 'green' };
+  return { nsColor: 'red', ewColor: 'yellow' };
+};
+
+// Traffic Light Stop
+// FIX: "Point of No Return" Logic
+// Visual Stop Line is at 11. Car Front is Center - 1.9.
+// To stop safely before line (Front > 11), Center must be > 12.9.
+// FIX: Robust Stop Logic
+// 1. Detection Zone: When to start checking logic (e.g. 18 units out)
+// 2. Point of No Return: If closer than this (e.g. 14 units) AND moving fast, DON'T stop.
+// 3. Anti-Creep: If we stopped (speed ~0), stay stopped even if past the point.
+const POINT_OF_NO_RETURN = STOP_LINE_DIST + 2.0; // ~14.0
+const DETECTION_ZONE = STOP_LINE_DIST + 7; // ~19
+
+const mustStopForLight = (distToCenter, isMovingAway, speed, light) => {
+  const approaching = distToCenter > STOP_LINE_DIST;
+  if (!approaching || distToCenter >= DETECTION_ZONE || isMovingAway) return false;
+
+  const pastPoint = distToCenter < POINT_OF_NO_RETURN;
+  const isMovingFast = speed > 0.1;
+
+  // If we are past the point and moving, we commit to going through.
+  if (pastPoint && isMovingFast) return false;
+
+  // Otherwise (before point OR stopped), observe lights
+  if (light === 'red') return true;
+  // If yellow and we are capable of stopping safely (before point), stop.
+  if (light === 'yellow') return !pastPoint;
+  return false;
+};
+
 // --- LOGIC ---
 const Simulation = ({ mode, timeScale }) => {
   const [cars, setCars] = useState([]);
@@ -273,33 +335,7 @@ const Simulation = ({ mode, timeScale }) => {
     // So we need a custom "simulation time" accumulator.
     // For simplicity, we'll keep lights separate or just accept they might desync visually if using 't'.
     // BETTER approach: Scale the cycle speed variables directly.
-    // 1. Lights Logic
-    let nsColor = 'red';
-    let ewColor = 'green';
-
-    if (isEmergency && mode === 'flux') {
-      // PREEMPTION: Force Green for Ambulance
-      if (ambulance.lane < 2) { nsColor = 'green'; ewColor = 'red'; }
-      else { nsColor = 'red'; ewColor = 'green'; }
-      // Reset AI timer so it doesn't switch immediately after
-      aiState.current.lastSwitch = t;
-    } else if (mode === 'baseline') {
-      // BASELINE: Fixed 14s Cycle (Blind Timer)
-      const cycle = (t % 14);
-      if (cycle < 6) { nsColor = 'green'; ewColor = 'red'; }
-      else if (cycle < 7) { nsColor = 'yellow'; ewColor = 'red'; }
-      else if (cycle < 13) { nsColor = 'red'; ewColor = 'green'; }
-      else { nsColor = 'red'; ewColor = 'yellow'; }
-    } else {
-      // FLUX AI: Safe Fast Cycle (Green Wave Effect)
-      // Reverted sensor logic to ensure continuous flow without deadlocks.
-      // 5s Total Cycle: 2s Green, 0.5s Yellow, 2.5s Red
-      const cycle = (t % 5);
-      if (cycle < 2.0) { nsColor = 'green'; ewColor = 'red'; }
-      else if (cycle < 2.5) { nsColor = 'yellow'; ewColor = 'red'; }
-      else if (cycle < 4.5) { nsColor = 'red'; ewColor = 'green'; }
-      else { nsColor = 'red'; ewColor = 'yellow'; }
-    }
+    const { nsColor, ewColor } = computeLights(mode, t, isEmergency ? ambulance.lane : null, aiState.current);
 
     // De-dupe updates to avoid render loop thrashing
     if (lightStateNS !== nsColor) setLightStateNS(nsColor);
@@ -365,45 +401,13 @@ const Simulation = ({ mode, timeScale }) => {
 
       let mustStop = false;
       const distToCenter = Math.sqrt(car.pos[0] ** 2 + car.pos[2] ** 2);
-      const STOP_LINE_DIST = 12; // Visual stop line location
-      const approaching = distToCenter > STOP_LINE_DIST;
-
-      // Traffic Light Stop
-      // FIX: "Point of No Return" Logic
-      // Visual Stop Line is at 11. Car Front is Center - 1.9.
-      // To stop safely before line (Front > 11), Center must be > 12.9.
-      // FIX: Robust Stop Logic
-      // 1. Detection Zone: When to start checking logic (e.g. 18 units out)
-      // 2. Point of No Return: If closer than this (e.g. 14 units) AND moving fast, DON'T stop.
-      // 3. Anti-Creep: If we stopped (speed ~0), stay stopped even if past the point.
-      const POINT_OF_NO_RETURN = STOP_LINE_DIST + 2.0; // ~14.0
-      const DETECTION_ZONE = STOP_LINE_DIST + 7; // ~19
 
       // FIX: Exit Logic. Only check stop if moving TOWARDS center.
       const isMovingAway = (car.pos[0] * car.dirVec[0] + car.pos[2] * car.dirVec[2]) > 0;
+      const light = (car.lane < 2) ? nsColor : ewColor;
 
-      if (approaching && distToCenter < DETECTION_ZONE && !isMovingAway) {
-        const pastPoint = distToCenter < POINT_OF_NO_RETURN;
-        const isMovingFast = car.speed > 0.1;
-
-        let light = (car.lane < 2) ? nsColor : ewColor;
-
-        // If we are past the point and moving, we commit to going through.
-        if (pastPoint && isMovingFast) {
-          mustStop = false;
-        } else {
-          // Otherwise (before point OR stopped), observe lights
-          if (light === 'red') {
-            mustStop = true;
-          } else if (light === 'yellow') {
-            // If yellow and we are capable of stopping safely (before point), stop.
-            if (!pastPoint) mustStop = true;
-          }
-        }
-
-        // Ambulance Override
-        if (car.type === 'ambulance') mustStop = false;
-      }
+      // Ambulance Override
+      if (car.type !== 'ambulance') mustStop = mustStopForLight(distToCenter, isMovingAway, car.speed, light);
 
       // Car Following Collision Check
       for (const other of prev) {
@@ -432,7 +436,7 @@ const Simulation = ({ mode, timeScale }) => {
       nextPos[0] += car.dirVec[0] * moveStep;
       nextPos[2] += car.dirVec[2] * moveStep;
 
-      if (distToCenter > 130 && !approaching) return null;
+      if (distToCenter > 130 && isMovingAway) return null;
       return { ...car, pos: nextPos };
     }).filter(c => c !== null));
   });
@@ -454,9 +458,288 @@ const Simulation = ({ mode, timeScale }) => {
   );
 };
 
+// --- INSTANCED MODE ---
+// Vehicle state lives in typed arrays (one slot per vehicle, packed in [0, count))
+// that are mutated inside useFrame, never in React state. Every vehicle is drawn
+// through a handful of InstancedMeshes, so the draw call count and React work
+// stay constant no matter how many vehicles are on screen.
+
+const MAX_VEHICLES = 4096;
+const SPAWN_DIST = 120;
+const DESPAWN_DIST = 130;
+const FOLLOW_GAP = 8; // 8 units gap
+const SPAWN_GAP = 15;
+const CABIN_SHADE = 0.07;
+
+// Per-lane spawn point, heading and travel direction
+const LANES = [
+  { x: -2, z: -SPAWN_DIST, rot: 0, dx: 0, dz: 1 }, // N->S
+  { x: 2, z: SPAWN_DIST, rot: Math.PI, dx: 0, dz: -1 }, // S->N
+  { x: SPAWN_DIST, z: -2, rot: -Math.PI / 2, dx: -1, dz: 0 }, // E->W (Faces West)
+  { x: -SPAWN_DIST, z: 2, rot: Math.PI / 2, dx: 1, dz: 0 }, // W->E (Faces East)
+].map(l => ({ ...l, cos: Math.cos(l.rot), sin: Math.sin(l.rot) }));
+
+const createFleet = (capacity) => ({
+  count: 0,
+  posX: new Float32Array(capacity),
+  posZ: new Float32Array(capacity),
+  speed: new Float32Array(capacity),
+  speedFactor: new Float32Array(capacity),
+  lane: new Uint8Array(capacity),
+  ambulance: new Uint8Array(capacity),
+  color: new Float32Array(capacity * 3),
+  // Scratch space for the per-lane ordering (rebuilt every frame)
+  progress: new Float32Array(capacity),
+  order: new Int32Array(capacity),
+});
+
+// Swap-remove keeps the live vehicles packed at the front of the arrays
+const removeVehicle = (fleet, i) => {
+  const last = fleet.count - 1;
+  if (i !== last) {
+    fleet.posX[i] = fleet.posX[last];
+    fleet.posZ[i] = fleet.posZ[last];
+    fleet.speed[i] = fleet.speed[last];
+    fleet.speedFactor[i] = fleet.speedFactor[last];
+    fleet.lane[i] = fleet.lane[last];
+    fleet.ambulance[i] = fleet.ambulance[last];
+    fleet.color.copyWithin(i * 3, last * 3, last * 3 + 3);
+  }
+  fleet.count = last;
+};
+
+// Bakes a flat vertex color into a geometry so parts can share one mesh
+const paint = (geometry, r, g, b) => {
+  const n = geometry.attributes.position.count;
+  const colors = new Float32Array(n * 3);
+  for (let i = 0; i < n; i++) { colors[i * 3] = r; colors[i * 3 + 1] = g; colors[i * 3 + 2] = b; }
+  geometry.setAttribute('color', new THREE.BufferAttribute(colors, 3));
+  return geometry;
+};
+
+const box = (w, h, d, x, y, z, shade) => paint(new THREE.BoxGeometry(w, h, d).translate(x, y, z), ...shade);
+
+// Writes a yaw-only transform straight into an instanceMatrix (column-major)
+const writeMatrix = (array, i, x, z, cos, sin) => {
+  const o = i * 16;
+  array[o] = cos; array[o + 1] = 0; array[o + 2] = -sin; array[o + 3] = 0;
+  array[o + 4] = 0; array[o + 5] = 1; array[o + 6] = 0; array[o + 7] = 0;
+  array[o + 8] = sin; array[o + 9] = 0; array[o + 10] = cos; array[o + 11] = 0;
+  array[o + 12] = x; array[o + 13] = 0; array[o + 14] = z; array[o + 15] = 1;
+};
+
+const withInstanceColor = (mesh) => {
+  // Must exist before the first render so the shader is compiled with instance colors
+  if (mesh && !mesh.instanceColor) {
+    mesh.instanceColor = new THREE.InstancedBufferAttribute(new Float32Array(MAX_VEHICLES * 3), 3);
+  }
+};
+
+const InstancedSimulation = ({ mode, timeScale, density, statsRef }) => {
+  const [lightStateNS, setLightStateNS] = useState('red');
+  const [lightStateEW, setLightStateEW] = useState('green');
+  const aiState = useRef({ lastSwitch: 0 });
+  const fleet = useRef(null);
+  if (fleet.current === null) fleet.current = createFleet(MAX_VEHICLES);
+  const hud = useRef({ lastUpdate: 0 });
+
+  const bodyRef = useRef();
+  const brakeRef = useRef();
+  const beaconRef = useRef();
+
+  const geometries = useMemo(() => {
+    const white = [1, 1, 1];
+    const cabin = [CABIN_SHADE, CABIN_SHADE, CABIN_SHADE];
+    const headlight = [0.8, 1, 1];
+    // Body + cabin + headlights in one geometry, tinted per instance
+    const body = mergeGeometries([
+      box(1.8, 0.6, 3.8, 0, 0.4, 0, white),
+      box(1.5, 0.7, 2.2, 0, 1.0, -0.3, cabin),
+      box(0.4, 0.15, 0.05, 0.6, 0.4, 1.91, headlight),
+      box(0.4, 0.15, 0.05, -0.6, 0.4, 1.91, headlight),
+    ]);
+    const brake = mergeGeometries([
+      box(0.4, 0.15, 0.05, 0.6, 0.4, -1.91, white),
+      box(0.4, 0.15, 0.05, -0.6, 0.4, -1.91, white),
+    ]);
+    // Ambulance light bar: red and blue halves
+    const beacon = mergeGeometries([
+      box(0.3, 0.2, 0.3, 0.5, 1.0, 1.5, [1, 0, 0]),
+      box(0.3, 0.2, 0.3, -0.5, 1.0, 1.5, [0, 0, 1]),
+    ]);
+    return { body, brake, beacon };
+  }, []);
+
+  useEffect(() => () => {
+    geometries.body.dispose();
+    geometries.brake.dispose();
+    geometries.beacon.dispose();
+  }, [geometries]);
+
+  useFrame((state, delta) => {
+    const f = fleet.current;
+    const safeDelta = Math.min(delta, 0.1);
+    const dt = safeDelta * timeScale;
+    const t = state.clock.getElapsedTime();
+
+    // 0. Check for Emergency Vehicle
+    let emergencyLane = null;
+    for (let i = 0; i < f.count; i++) {
+      if (f.ambulance[i]) { emergencyLane = f.lane[i]; break; }
+    }
+
+    // 1. Lights Logic
+    const { nsColor, ewColor } = computeLights(mode, t, emergencyLane, aiState.current);
+    if (lightStateNS !== nsColor) setLightStateNS(nsColor);
+    if (lightStateEW !== ewColor) setLightStateEW(ewColor);
+
+    // 2. Order each lane by progress along its direction (leader first).
+    // Replaces the all-pairs following check with a sort per lane.
+    const laneStart = [0, 0, 0, 0, 0];
+    for (let i = 0; i < f.count; i++) laneStart[f.lane[i] + 1]++;
+    for (let l = 0; l < 4; l++) laneStart[l + 1] += laneStart[l];
+    const fill = laneStart.slice(0, 4);
+    for (let i = 0; i < f.count; i++) {
+      const lane = LANES[f.lane[i]];
+      f.progress[i] = f.posX[i] * lane.dx + f.posZ[i] * lane.dz;
+      f.order[fill[f.lane[i]]++] = i;
+    }
+    for (let l = 0; l < 4; l++) {
+      f.order.subarray(laneStart[l], laneStart[l + 1]).sort((a, b) => f.progress[b] - f.progress[a]);
+    }
+
+    // 3. Spawn - the rear-most vehicle of a lane decides if its entry is blocked
+    const rear = [Infinity, Infinity, Infinity, Infinity];
+    for (let l = 0; l < 4; l++) {
+      if (laneStart[l + 1] > laneStart[l]) rear[l] = f.progress[f.order[laneStart[l + 1] - 1]];
+    }
+    const expected = SPAWN_RATE * timeScale * density;
+    let spawns = Math.floor(expected) + (Math.random() < expected % 1 ? 1 : 0);
+    while (spawns-- > 0 && f.count < MAX_VEHICLES) {
+      const l = Math.floor(Math.random() * 4);
+      const lane = LANES[l];
+      const spawnProgress = lane.x * lane.dx + lane.z * lane.dz;
+      if (rear[l] - spawnProgress < SPAWN_GAP) continue;
+      const i = f.count++;
+      f.posX[i] = lane.x;
+      f.posZ[i] = lane.z;
+      f.speed[i] = 0;
+      f.speedFactor[i] = 0.9 + Math.random() * 0.2; // +/- 10% Speed Variance
+      f.lane[i] = l;
+      f.ambulance[i] = (emergencyLane === null && Math.random() < 0.03) ? 1 : 0; // 3% Chance of Ambulance
+      if (f.ambulance[i]) emergencyLane = l;
+      const c = f.ambulance[i] ? new THREE.Color('#ffffff')
+        : new THREE.Color().setHSL((200 + Math.random() * 40) / 360, 0.7 + Math.random() * 0.2, 0.5 + Math.random() * 0.2);
+      f.color[i * 3] = c.r; f.color[i * 3 + 1] = c.g; f.color[i * 3 + 2] = c.b;
+      rear[l] = spawnProgress;
+    }
+
+    // 4. Move Cars
+    const FPS_SCALE = dt / 0.016;
+    const acceleration = 0.01 * timeScale * FPS_SCALE;
+    const braking = 0.08 * timeScale * FPS_SCALE;
+    const isAI = mode === 'flux';
+    for (let l = 0; l < 4; l++) {
+      const lane = LANES[l];
+      const light = (l < 2) ? nsColor : ewColor;
+      for (let k = laneStart[l]; k < laneStart[l + 1]; k++) {
+        const i = f.order[k];
+        let baseSpeed = (mode === 'baseline' ? CAR_SPEED : CAR_SPEED_FAST);
+        if (f.ambulance[i]) baseSpeed = 0.65;
+        const targetSpeed = baseSpeed * (isAI ? 1.0 : f.speedFactor[i]);
+        if (f.speed[i] < targetSpeed) f.speed[i] += acceleration;
+
+        const distToCenter = Math.sqrt(f.posX[i] ** 2 + f.posZ[i] ** 2);
+        const isMovingAway = f.progress[i] > 0;
+        let mustStop = !f.ambulance[i] && mustStopForLight(distToCenter, isMovingAway, f.speed[i], light);
+
+        // Car Following - only the vehicle directly ahead matters
+        if (k > laneStart[l]) {
+          const gap = f.progress[f.order[k - 1]] - f.progress[i];
+          if (gap > 0 && gap < FOLLOW_GAP) mustStop = true;
+        }
+        if (mustStop) f.speed[i] = Math.max(0, f.speed[i] - braking);
+
+        const moveStep = f.speed[i] * FPS_SCALE;
+        f.posX[i] += lane.dx * moveStep;
+        f.posZ[i] += lane.dz * moveStep;
+      }
+    }
+
+    // 5. Despawn vehicles that have left the scene (iterate backwards for swap-remove)
+    for (let i = f.count - 1; i >= 0; i--) {
+      const lane = LANES[f.lane[i]];
+      const progress = f.posX[i] * lane.dx + f.posZ[i] * lane.dz;
+      if (progress > DESPAWN_DIST) removeVehicle(f, i);
+    }
+
+    // 6. Upload transforms and colors
+    const body = bodyRef.current;
+    const brake = brakeRef.current;
+    const beacon = beaconRef.current;
+    if (!body || !brake || !beacon) return;
+    const flash = Math.sin(Date.now() / 100) > 0 ? 5 : 0.2;
+    let beacons = 0;
+    for (let i = 0; i < f.count; i++) {
+      const lane = LANES[f.lane[i]];
+      writeMatrix(body.instanceMatrix.array, i, f.posX[i], f.posZ[i], lane.cos, lane.sin);
+      writeMatrix(brake.instanceMatrix.array, i, f.posX[i], f.posZ[i], lane.cos, lane.sin);
+      body.instanceColor.array.set(f.color.subarray(i * 3, i * 3 + 3), i * 3);
+      // Brake lights: values above 1 feed the bloom pass
+      const glow = f.speed[i] < 0.05 ? 5 : 0.5;
+      brake.instanceColor.array[i * 3] = glow;
+      brake.instanceColor.array[i * 3 + 1] = 0;
+      brake.instanceColor.array[i * 3 + 2] = 0;
+      if (f.ambulance[i]) {
+        writeMatrix(beacon.instanceMatrix.array, beacons, f.posX[i], f.posZ[i], lane.cos, lane.sin);
+        beacon.instanceColor.array.fill(flash, beacons * 3, beacons * 3 + 3);
+        beacons++;
+      }
+    }
+    body.count = f.count;
+    brake.count = f.count;
+    beacon.count = beacons;
+    for (const mesh of [body, brake, beacon]) {
+      mesh.instanceMatrix.needsUpdate = true;
+      mesh.instanceColor.needsUpdate = true;
+    }
+
+    // HUD readout, written to the DOM directly a few times per second
+    if (statsRef.current && t - hud.current.lastUpdate > 0.25) {
+      statsRef.current.textContent = `${f.count}`;
+      hud.current.lastUpdate = t;
+    }
+  });
+
+  return (
+    <group>
+      <TrafficLight position={[-8, 0, 12]} rotation={[0, 0, 0]} state={lightStateNS} />
+      <TrafficLight position={[8, 0, -12]} rotation={[0, Math.PI, 0]} state={lightStateNS} />
+      <TrafficLight position={[12, 0, 8]} rotation={[0, -Math.PI / 2, 0]} state={lightStateEW} />
+      <TrafficLight position={[-12, 0, -8]} rotation={[0, Math.PI / 2, 0]} state={lightStateEW} />
+
+      <instancedMesh ref={(m) => { bodyRef.current = m; withInstanceColor(m); }}
+        args={[geometries.body, undefined, MAX_VEHICLES]} frustumCulled={false} castShadow receiveShadow>
+        <meshStandardMaterial vertexColors metalness={0.6} roughness={0.2} />
+      </instancedMesh>
+      <instancedMesh ref={(m) => { brakeRef.current = m; withInstanceColor(m); }}
+        args={[geometries.brake, undefined, MAX_VEHICLES]} frustumCulled={false}>
+        <meshBasicMaterial toneMapped={false} />
+      </instancedMesh>
+      <instancedMesh ref={(m) => { beaconRef.current = m; withInstanceColor(m); }}
+        args={[geometries.beacon, undefined, MAX_VEHICLES]} frustumCulled={false}>
+        <meshBasicMaterial vertexColors toneMapped={false} />
+      </instancedMesh>
+    </group>
+  );
+};
+
 export default function App() {
   const [mode, setMode] = useState('baseline');
   const [timeScale, setTimeScale] = useState(1.0); // 1.0 = Regular, 0.1 = SlowMo
+  const [renderMode, setRenderMode] = useState('classic'); // 'classic' = one React component per car
+  const [density, setDensity] = useState(1); // Spawn rate multiplier (instanced mode only)
+  const vehicleCountRef = useRef(null);
 
   return (
     <div style={{ width: '100vw', height: '100vh', background: '#050505', fontFamily: "'Inter', sans-serif" }}>
@@ -495,7 +778,7 @@ export default function App() {
         </div>
 
         {/* SLOW MO TOGGLE */}
-        <div style={{ background: '#111', borderRadius: '8px', padding: '4px', display: 'flex', marginBottom: '24px' }}>
+        <div style={{ background: '#111', borderRadius: '8px', padding: '4px', display: 'flex', marginBottom: '8px' }}>
           <button onClick={() => setTimeScale(1.0)} style={{
             flex: 1, padding: '6px', border: 'none', borderRadius: '4px', cursor: 'pointer',
             background: timeScale === 1.0 ? '#444' : 'transparent',
@@ -508,6 +791,33 @@ export default function App() {
           }}>🐢 SLOW MO</button>
         </div>
 
+        {/* RENDER MODE TOGGLE */}
+        <div style={{ background: '#111', borderRadius: '8px', padding: '4px', display: 'flex', marginBottom: renderMode === 'instanced' ? '8px' : '24px' }}>
+          {['classic', 'instanced'].map(m => (
+            <button key={m} onClick={() => setRenderMode(m)} style={{
+              flex: 1, padding: '6px', border: 'none', borderRadius: '4px', cursor: 'pointer',
+              background: renderMode === m ? '#444' : 'transparent',
+              color: renderMode === m ? '#fff' : '#666', fontSize: '0.8rem', fontWeight: '600'
+            }}>{m.toUpperCase()}</button>
+          ))}
+        </div>
+
+        {/* DENSITY TOGGLE (Instanced only) */}
+        {renderMode === 'instanced' && (
+          <div style={{ background: '#111', borderRadius: '8px', padding: '4px', display: 'flex', alignItems: 'center', marginBottom: '24px' }}>
+            {[1, 10, 50].map(d => (
+              <button key={d} onClick={() => setDensity(d)} style={{
+                flex: 1, padding: '6px', border: 'none', borderRadius: '4px', cursor: 'pointer',
+                background: density === d ? '#00ccff' : 'transparent',
+                color: density === d ? '#fff' : '#666', fontSize: '0.8rem', fontWeight: '600'
+              }}>x{d} DENSITY</button>
+            ))}
+            <div style={{ flex: 1, textAlign: 'center', fontSize: '0.8rem', color: '#aaa' }}>
+              <span ref={vehicleCountRef}>0</span> VEH
+            </div>
+          </div>
+        )}
+
 
 
         {/* Stats Grid */}
@@ -543,7 +853,9 @@ export default function App() {
         {/* Scene */}
         <Road />
         <Scenery />
-        <Simulation mode={mode} timeScale={timeScale} />
+        {renderMode === 'instanced' ?
+          <InstancedSimulation mode={mode} timeScale={timeScale} density={density} statsRef={vehicleCountRef} /> :
+          <Simulation mode={mode} timeScale={timeScale} />}
 
         {/* Post Processing - The "Blender" Look */}
         <EffectComposer disableNormalPass>
@@ -0,0 +1,60 @@
+import argparse
+import importlib
+import sys
+
+# Single entry point for the FlowState workflow.
+#
+#   flowstate <command> [args...]     (see COMMANDS below)
+#
+# Nothing heavy (traci, sumolib, gymnasium, stable_baselines3, torch) is imported
+# here: each subcommand's module is only imported once it is actually chosen,
+# so `flowstate --help` starts in tens of milliseconds. The subcommand modules
+# in turn import them inside the functions that use them, so
+# `flowstate <command> --help` (and cached evaluations) stay fast as well.
+
+# name -> (module, leading args passed to module.main, help)
+COMMANDS = {
+    "setup": ("step1_setup", [], "Generate network, routes and config, then smoke-test SUMO"),
+    "trim": ("trim_network", [], "Cut the network to a radius around the controlled junction"),
+    "net": ("net_arrays", [], "Build the memory-mapped array form of a network (shared by workers)"),
+    "verify": ("step2_verify_camera", [], "Run SUMO and print the virtual camera state vectors"),
+    "snapshots": ("snapshot_bank", [], "Pre-generate warm-state snapshots for episode starts"),
+    "train": ("step3_train", [], "Train the PPO agent"),
+    "tune": ("tune", [], "Parallel PPO hyperparameter search with pruning (SQLite study)"),
+    "evaluate": ("step4_evaluate", [], "Compare the fixed-time baseline against a trained policy"),
+    "fidelity": ("fidelity", [], "Compare mesoscopic against microscopic simulation"),
+    "pipeline": ("pipeline", [], "Benchmark pipelined multi-env stepping against a sequential loop"),
+    "showcase": ("step5_showcase", [], "Run the side-by-side SUMO GUI demo"),
+    "export": ("policy_export", ["export"], "Convert an SB3 model zip into a NumPy-only .npz policy"),
+    "bench": ("policy_export", ["bench"], "Benchmark SB3 vs NumPy policy startup and latency"),
+    "distill": ("distill", [], "Distil a trained policy into a dependency-free decision tree"),
+}
+
+
+def build_parser():
+    lines = [f"  {name:<10} {help_text}" for name, (_, _, help_text) in COMMANDS.items()]
+    parser = argparse.ArgumentParser(
+        prog="flowstate",
+        description="FlowState adaptive traffic signal control.",
+        epilog="commands:\n" + "\n".join(lines) + "\n\nRun 'flowstate <command> --help' for command options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    module_name, prefix, _ = COMMANDS[args.command]
+
+    # SUMO_HOME is resolved once here, before any module imports traci
+    from sumo_setup import ensure_sumo
+    ensure_sumo()
+
+    module = importlib.import_module(module_name)
+    return module.main(prefix + args.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import math
+
+# Online (streaming) statistics for evaluation runs.
+# Everything in here uses memory that depends on the number of approaches and
+# time windows, never on the number of vehicles, and every structure can be
+# merged exactly with one built by another worker.
+
+
+class RunningStats:
+    """
+    Streaming count / mean / variance / min / max (Welford).
+    merge() uses Chan et al.'s parallel update, so combining workers gives the
+    same result as one pass over all samples.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.total = 0.0
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.total += x
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max, self.total = other.min, other.max, other.total
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self.m2 += other.m2 + delta * delta * self.count * other.count / n
+        self.count = n
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        # Sample variance
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class Histogram:
+    """
+    Fixed-bin histogram over [low, high). Values outside the range land in
+    underflow / overflow counters. Two histograms with the same bins merge exactly.
+    """
+    def __init__(self, low=0.0, high=300.0, bins=60):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low) / bins
+        self.counts = [0] * bins
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, x):
+        if x < self.low:
+            self.underflow += 1
+        elif x >= self.high:
+            self.overflow += 1
+        else:
+            self.counts[int((x - self.low) / self.width)] += 1
+
+    def merge(self, other):
+        if (self.low, self.high, self.bins) != (other.low, other.high, other.bins):
+            raise ValueError("Cannot merge histograms with different bins")
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def edges(self):
+        return [self.low + i * self.width for i in range(self.bins + 1)]
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style).
+    Any quantile is returned with at most `relative_accuracy` relative error.
+    Buckets are plain counts, so merging two sketches with the same accuracy is
+    exact: the merged sketch is identical to one fed with all values.
+    Only non-negative values are expected (delays, times, counts).
+    """
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x <= self.min_value:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(x) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def merge(self, other):
+        if (self.relative_accuracy, self.min_value) != (other.relative_accuracy, other.min_value):
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, c in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint (in relative terms) of the bucket (gamma^(k-1), gamma^k]
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class Metric:
+    """Running stats + histogram + quantile sketch for one quantity."""
+    def __init__(self, low=0.0, high=300.0, bins=60):
+        self.stats = RunningStats()
+        self.hist = Histogram(low, high, bins)
+        self.sketch = QuantileSketch()
+
+    def add(self, x):
+        self.stats.add(x)
+        self.hist.add(x)
+        self.sketch.add(x)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.hist.merge(other.hist)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def summary(self):
+        return {
+            "count": self.stats.count,
+            "mean": self.stats.mean,
+            "std": self.stats.std,
+            "min": self.stats.min if self.stats.count else math.nan,
+            "max": self.stats.max if self.stats.count else math.nan,
+            "p50": self.sketch.quantile(0.50),
+            "p90": self.sketch.quantile(0.90),
+            "p95": self.sketch.quantile(0.95),
+            "p99": self.sketch.quantile(0.99),
+        }
+
+
+# Histogram ranges per metric (value units: seconds, seconds, stops, vehicles)
+METRIC_BINS = {
+    "delay": (0.0, 600.0, 120),
+    "travel_time": (0.0, 1200.0, 120),
+    "stops": (0.0, 20.0, 20),
+    "queue": (0.0, 100.0, 100),
+}
+
+
+class MetricsCollector:
+    """
+    Online evaluation metrics, split per approach and per time window.
+
+    Per-vehicle metrics (delay, travel_time, stops) are recorded when a vehicle
+    leaves the network; queue length is recorded per approach every step.
+    Approaches are free-form labels (the camera uses North/South/East/West).
+    """
+    def __init__(self, window=900.0):
+        self.window = window
+        # (metric, approach, window index) -> Metric
+        self.metrics = {}
+
+    def _get(self, name, approach, sim_time):
+        key = (name, approach, int(sim_time // self.window))
+        metric = self.metrics.get(key)
+        if metric is None:
+            metric = self.metrics[key] = Metric(*METRIC_BINS[name])
+        return metric
+
+    def record_vehicle(self, approach, arrival_time, delay, travel_time, stops):
+        self._get("delay", approach, arrival_time).add(delay)
+        self._get("travel_time", approach, arrival_time).add(travel_time)
+        self._get("stops", approach, arrival_time).add(stops)
+
+    def record_queue(self, approach, sim_time, length):
+        self._get("queue", approach, sim_time).add(length)
+
+    def merge(self, other):
+        if self.window != other.window:
+            raise ValueError("Cannot merge collectors with different time windows")
+        for key, metric in other.metrics.items():
+            name = key[0]
+            if key not in self.metrics:
+                self.metrics[key] = Metric(*METRIC_BINS[name])
+            self.metrics[key].merge(metric)
+        return self
+
+    def approaches(self):
+        return sorted({key[1] for key in self.metrics})
+
+    def windows(self):
+        return sorted({key[2] for key in self.metrics})
+
+    def combined(self, name, approach=None, window=None):
+        """Merges every matching (approach, window) cell into one Metric."""
+        result = Metric(*METRIC_BINS[name])
+        for (m, a, w), metric in self.metrics.items():
+            if m != name:
+                continue
+            if approach is not None and a != approach:
+                continue
+            if window is not None and w != window:
+                continue
+            result.merge(metric)
+        return result
+
+    def summary(self, name, approach=None, window=None):
+        return self.combined(name, approach, window).summary()
+
+    def print_report(self, label="Metrics"):
+        print(f"{label} - per-vehicle / per-step distributions")
+        print(f"  {'Metric':<12} | {'Approach':<8} | {'N':>6} | {'Mean':>8} | {'P50':>8} | {'P95':>8} | {'Max':>8}")
+        for name in ("delay", "travel_time", "stops", "queue"):
+            for approach in [None] + self.approaches():
+                s = self.summary(name, approach)
+                if s["count"] == 0:
+                    continue
+                label_a = approach or "All"
+                print(f"  {name:<12} | {label_a:<8} | {s['count']:>6} | {s['mean']:>8.2f} | "
+                      f"{s['p50']:>8.2f} | {s['p95']:>8.2f} | {s['max']:>8.2f}")
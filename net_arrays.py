@@ -0,0 +1,272 @@
+import argparse
+import heapq
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from digests import file_digest
+
+# Compact, read-only network model shared between worker processes.
+#
+# sumolib.net.readNet builds a large graph of Python objects in every process
+# that calls it. Here the network is converted once into flat NumPy arrays
+# (.npy files next to the net) and every process memory-maps them read-only,
+# so all workers share the same pages of the OS file cache.
+#
+# Layout (all indices are int32 into the arrays of the named kind):
+#   nodes   node_ids, node_xy, node_tls
+#   edges   edge_ids, edge_from, edge_to, edge_length, edge_speed
+#           edge_lanes (CSR offsets into lanes), edge_shape (CSR offsets into shape_xy)
+#   lanes   lane_ids, lane_edge, lane_length, lane_speed
+#   graph   node_in / node_in_edges, node_out / node_out_edges, edge_succ / edge_succ_edges
+#           (CSR: the neighbours of i are X_edges[X[i]:X[i + 1]])
+#   lookup  <kind>_sorted_ids / <kind>_sorted_index for id -> index by binary search
+#
+# Internal (junction) edges are left out, as in sumolib's default readNet.
+#
+#   python net_arrays.py intersection.net.xml
+
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+_open = {}
+# Threads in one process (e.g. pipeline workers) open a net once, together
+_open_lock = threading.Lock()
+
+
+def arrays_dir(net_file):
+    return net_file + ".arrays"
+
+
+def cache_arrays_dir(net_file):
+    """Fallback location when the net's own directory is read-only, keyed by the net's content."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "flowstate", "net_arrays", file_digest(net_file))
+
+
+def _offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+    return offsets
+
+
+def _csr(lists):
+    offsets = _offsets([len(items) for items in lists])
+    flat = np.fromiter((x for items in lists for x in items), dtype=np.int32, count=int(offsets[-1]))
+    return offsets, flat
+
+
+def _lookup(ids):
+    order = np.argsort(ids, kind="stable").astype(np.int32)
+    return ids[order], order
+
+
+def build(net_file, out_dir=None):
+    """Converts net_file with sumolib (only needed here) and writes the arrays. Returns the directory."""
+    import sumolib
+
+    out_dir = out_dir or arrays_dir(net_file)
+    net = sumolib.net.readNet(net_file)
+    nodes = net.getNodes()
+    edges = net.getEdges()
+    node_index = {n.getID(): i for i, n in enumerate(nodes)}
+    edge_index = {e.getID(): i for i, e in enumerate(edges)}
+    lanes = [lane for e in edges for lane in e.getLanes()]
+
+    arrays = {
+        "node_ids": np.array([n.getID() for n in nodes], dtype=str),
+        "node_xy": np.array([n.getCoord()[:2] for n in nodes], dtype=np.float64).reshape(-1, 2),
+        "node_tls": np.array([n.getType() == "traffic_light" for n in nodes], dtype=bool),
+        "edge_ids": np.array([e.getID() for e in edges], dtype=str),
+        "edge_from": np.array([node_index[e.getFromNode().getID()] for e in edges], dtype=np.int32),
+        "edge_to": np.array([node_index[e.getToNode().getID()] for e in edges], dtype=np.int32),
+        "edge_length": np.array([e.getLength() for e in edges], dtype=np.float64),
+        "edge_speed": np.array([e.getSpeed() for e in edges], dtype=np.float64),
+        "lane_ids": np.array([lane.getID() for lane in lanes], dtype=str),
+        "lane_edge": np.array([edge_index[lane.getEdge().getID()] for lane in lanes], dtype=np.int32),
+        "lane_length": np.array([lane.getLength() for lane in lanes], dtype=np.float64),
+        "lane_speed": np.array([lane.getSpeed() for lane in lanes], dtype=np.float64),
+    }
+    arrays["edge_lanes"] = _offsets([len(e.getLanes()) for e in edges])
+    arrays["edge_shape"] = _offsets([len(e.getShape()) for e in edges])
+    arrays["shape_xy"] = np.array([p[:2] for e in edges for p in e.getShape()], dtype=np.float64).reshape(-1, 2)
+    arrays["node_in"], arrays["node_in_edges"] = _csr(
+        [[edge_index[e.getID()] for e in n.getIncoming() if e.getID() in edge_index] for n in nodes])
+    arrays["node_out"], arrays["node_out_edges"] = _csr(
+        [[edge_index[e.getID()] for e in n.getOutgoing() if e.getID() in edge_index] for n in nodes])
+    # Successors follow lane connections, like sumolib's routing
+    arrays["edge_succ"], arrays["edge_succ_edges"] = _csr(
+        [[edge_index[s.getID()] for s in e.getOutgoing() if s.getID() in edge_index] for e in edges])
+    for kind in ("node", "edge", "lane"):
+        arrays[f"{kind}_sorted_ids"], arrays[f"{kind}_sorted_index"] = _lookup(arrays[f"{kind}_ids"])
+
+    # Write into a fresh directory and swap it in, so readers never see a partial build
+    meta = {"version": FORMAT_VERSION, "net_file": os.path.abspath(net_file), "net_sha256": file_digest(net_file),
+            "nodes": len(nodes), "edges": len(edges), "lanes": len(lanes)}
+    parent = os.path.dirname(out_dir) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(out_dir) + ".", suffix=".tmp", dir=parent)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, name + ".npy"), array)
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+    except OSError:
+        # Read-only or full disk: leave nothing half-written behind
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        # Fine if another process finished the same build first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not _is_current(net_file, out_dir):
+            raise
+    return out_dir
+
+
+def _is_current(net_file, directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get("version") == FORMAT_VERSION and meta.get("net_sha256") == file_digest(net_file)
+
+
+def open_net(net_file):
+    """
+    The NetArrays for net_file, building them first if they are missing or
+    the net has changed. They live next to the net, or in the user cache
+    (cache_arrays_dir) if that directory cannot be written. Opened once per process.
+    """
+    key = os.path.abspath(net_file)
+    net = _open.get(key)
+    if net is not None:
+        return net
+    with _open_lock:
+        net = _open.get(key)
+        if net is not None:
+            return net
+        candidates = [arrays_dir(net_file), cache_arrays_dir(net_file)]
+        directory = next((d for d in candidates if _is_current(net_file, d)), None)
+        if directory is None:
+            for i, candidate in enumerate(candidates):
+                try:
+                    directory = build(net_file, candidate)
+                    break
+                except OSError as e:
+                    if i == len(candidates) - 1:
+                        raise
+                    print(f"Cannot write network arrays to {candidate} ({e}), using {candidates[i + 1]}")
+        net = _open[key] = NetArrays(directory)
+    return net
+
+
+class NetArrays:
+    """Read-only view of a converted network; every array is memory-mapped."""
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as f:
+            self.meta = json.load(f)
+        for name in os.listdir(directory):
+            if name.endswith(".npy"):
+                setattr(self, name[:-4], np.load(os.path.join(directory, name), mmap_mode="r"))
+
+    def _index(self, kind, item_id):
+        sorted_ids = getattr(self, f"{kind}_sorted_ids")
+        i = int(np.searchsorted(sorted_ids, item_id))
+        if i >= len(sorted_ids) or sorted_ids[i] != item_id:
+            raise KeyError(f"Unknown {kind} '{item_id}'")
+        return int(getattr(self, f"{kind}_sorted_index")[i])
+
+    def node_index(self, node_id):
+        return self._index("node", node_id)
+
+    def edge_index(self, edge_id):
+        return self._index("edge", edge_id)
+
+    def lane_index(self, lane_id):
+        return self._index("lane", lane_id)
+
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.edge_ids)
+
+    def incoming_edges(self, node):
+        """Edge indices entering a node (index or id)."""
+        i = node if isinstance(node, (int, np.integer)) else self.node_index(node)
+        return self.node_in_edges[self.node_in[i]:self.node_in[i + 1]]
+
+    def outgoing_edges(self, node):
+        i = node if isinstance(node, (int, np.integer)) else self.node_index(node)
+        return self.node_out_edges[self.node_out[i]:self.node_out[i + 1]]
+
+    def edge_lane_ids(self, edge):
+        i = edge if isinstance(edge, (int, np.integer)) else self.edge_index(edge)
+        return [str(lane_id) for lane_id in self.lane_ids[self.edge_lanes[i]:self.edge_lanes[i + 1]]]
+
+    def edge_shape_xy(self, edge):
+        """(k, 2) view of the edge's shape points."""
+        i = edge if isinstance(edge, (int, np.integer)) else self.edge_index(edge)
+        return self.shape_xy[self.edge_shape[i]:self.edge_shape[i + 1]]
+
+    def lane_length_of(self, lane_id):
+        return float(self.lane_length[self.lane_index(lane_id)])
+
+    def shortest_path(self, from_edge, to_edge):
+        """
+        Dijkstra over edge successors with edge length as cost, both end edges
+        included (as sumolib's getShortestPath). Returns (edge ids, cost) or
+        (None, inf) if to_edge cannot be reached.
+        """
+        source, target = self.edge_index(from_edge), self.edge_index(to_edge)
+        length, succ, succ_edges = self.edge_length, self.edge_succ, self.edge_succ_edges
+        dist = {source: float(length[source])}
+        prev = {}
+        heap = [(dist[source], source)]
+        while heap:
+            d, e = heapq.heappop(heap)
+            if e == target:
+                path = [e]
+                while path[-1] != source:
+                    path.append(prev[path[-1]])
+                return [str(self.edge_ids[i]) for i in reversed(path)], d
+            if d > dist.get(e, math.inf):
+                continue
+            for n in succ_edges[succ[e]:succ[e + 1]]:
+                n = int(n)
+                nd = d + float(length[n])
+                if nd < dist.get(n, math.inf):
+                    dist[n] = nd
+                    prev[n] = e
+                    heapq.heappush(heap, (nd, n))
+        return None, math.inf
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the memory-mapped array form of a SUMO network.")
+    parser.add_argument("net_file", nargs="?", default="intersection.net.xml")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the arrays are up to date")
+    args = parser.parse_args(argv)
+    if args.force:
+        build(args.net_file)
+    net = open_net(args.net_file)
+    size = sum(os.path.getsize(os.path.join(net.directory, n)) for n in os.listdir(net.directory))
+    print(f"{net.directory}: {net.meta['nodes']} nodes, {net.meta['edges']} edges, {net.meta['lanes']} lanes "
+          f"({size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
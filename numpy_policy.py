@@ -0,0 +1,93 @@
+import numpy as np
+
+# NumPy-only runtime for exported PPO policies.
+# Importing this module must never pull in torch or stable_baselines3:
+# evaluation workers and field controllers only need a tiny MLP forward pass.
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "leakyrelu": lambda x: np.where(x > 0, x, 0.01 * x),
+    "elu": lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0.0))),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "identity": lambda x: x,
+}
+
+
+class NumpyPolicy:
+    """
+    Drop-in replacement for a loaded SB3 PPO model on discrete actions.
+    predict() has the same signature as PPO.predict and accepts either a single
+    observation (shape (4,)) or a batch (shape (n, 4)).
+    """
+    def __init__(self, weights, biases, action_weight, action_bias, activation="tanh", seed=None):
+        self.weights = [np.asarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.action_weight = np.asarray(action_weight, dtype=np.float32)
+        self.action_bias = np.asarray(action_bias, dtype=np.float32)
+        self.activation = activation
+        self._act = ACTIVATIONS[activation]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        n_layers = int(data["n_layers"])
+        weights = [data[f"w{i}"] for i in range(n_layers)]
+        biases = [data[f"b{i}"] for i in range(n_layers)]
+        return cls(weights, biases, data["action_w"], data["action_b"], activation=str(data["activation"]))
+
+    def save(self, path):
+        arrays = {"n_layers": np.array(len(self.weights)), "activation": np.array(self.activation),
+                  "action_w": self.action_weight, "action_b": self.action_bias}
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"w{i}"] = w
+            arrays[f"b{i}"] = b
+        np.savez(path, **arrays)
+
+    def logits(self, obs):
+        x = np.asarray(obs, dtype=np.float32)
+        for w, b in zip(self.weights, self.biases):
+            x = self._act(x @ w.T + b)
+        return x @ self.action_weight.T + self.action_bias
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        x = np.asarray(obs, dtype=np.float32)
+        single = x.ndim == 1
+        if single:
+            x = x[None, :]
+        logits = self.logits(x)
+        if deterministic:
+            actions = logits.argmax(axis=1)
+        else:
+            # Sample from the categorical distribution, like SB3 does
+            z = logits - logits.max(axis=1, keepdims=True)
+            probs = np.exp(z)
+            probs /= probs.sum(axis=1, keepdims=True)
+            u = self._rng.random((len(probs), 1))
+            actions = (probs.cumsum(axis=1) < u).sum(axis=1)
+            actions = np.minimum(actions, probs.shape[1] - 1)
+        if single:
+            return actions[0], state
+        return actions, state
+
+
+class ZeroPolicy:
+    """Always 'keep phase': SUMO's own fixed-time program drives the light."""
+    def predict(self, obs, deterministic=True):
+        return 0, None
+
+
+def load_policy(path):
+    """
+    Loads an exported .npz policy (NumPy only), a distilled .json decision
+    tree (standard library only) or an SB3 model zip.
+    stable_baselines3 is only imported for the latter.
+    """
+    if str(path).endswith(".npz"):
+        return NumpyPolicy.load(path)
+    if str(path).endswith(".json"):
+        from distilled_controller import DistilledController
+        return DistilledController.load(path)
+    from stable_baselines3 import PPO
+    return PPO.load(path)
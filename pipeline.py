@@ -0,0 +1,192 @@
+import argparse
+import queue
+import threading
+import time
+
+import numpy as np
+
+from sumo_setup import ensure_sumo
+
+ensure_sumo()
+
+from numpy_policy import ZeroPolicy, load_policy
+
+# Pipelined stepping of several environments in one process.
+#
+# In a plain loop, Python sits idle in traci.simulationStep() while SUMO
+# computes, and SUMO sits idle while Python polls the reward/observation and
+# runs the policy. Here every env gets a worker thread that owns its TraCI
+# connection. Waiting on the SUMO socket releases the GIL, so while one SUMO
+# computes its step the other workers poll their own SUMO, and the main thread
+# runs one batched predict over every env that is ready.
+#
+#   python pipeline.py --envs 4 --steps 4000 --model flux_policy.npz
+
+_STOP = object()
+
+
+def predict_batch(policy, observations, phases=None):
+    """
+    One predict call for a list of observations; returns one action per observation.
+    phases (one per observation) is passed on to policies that read the phase.
+    """
+    if getattr(policy, "needs_phase", False):
+        actions, _ = policy.predict(np.stack(observations), deterministic=True, phases=phases)
+    else:
+        actions, _ = policy.predict(np.stack(observations), deterministic=True)
+    # Policies that ignore the batch (e.g. ZeroPolicy) return a single action
+    return np.broadcast_to(np.asarray(actions).reshape(-1), (len(observations),))
+
+
+class PipelinedRunner:
+    """
+    Drives `envs` with `policy`, one worker thread per env. Each env must have
+    its own TraCI label and leave traci's current connection alone
+    (TrafficLightEnv(label=..., switch_connection=False)). Episodes are reset
+    automatically; the caller closes the envs.
+    """
+    def __init__(self, envs, policy, max_batch=None):
+        labels = [env.label for env in envs]
+        if len(set(labels)) != len(labels):
+            raise ValueError("Each env needs its own TraCI label to run in parallel")
+        if any(env.switch_connection for env in envs):
+            raise ValueError("Envs run in parallel must not switch traci's current connection (switch_connection=False)")
+        self.envs = envs
+        self.policy = policy
+        self.max_batch = max_batch or len(envs)
+
+    def _work(self, i, inbox, ready):
+        env = self.envs[i]
+        # The phase is read here, over the worker's own connection, only if the policy uses it
+        needs_phase = getattr(self.policy, "needs_phase", False)
+        try:
+            obs, _ = env.reset()
+            ready.put((i, obs, None, False, env.current_phase() if needs_phase else None))
+            while True:
+                action = inbox.get()
+                if action is _STOP:
+                    return
+                obs, reward, terminated, truncated, _ = env.step(action)
+                done = terminated or truncated
+                if done:
+                    obs, _ = env.reset()
+                ready.put((i, obs, reward, done, env.current_phase() if needs_phase else None))
+        except Exception as e:
+            ready.put((i, None, e, True, None))
+
+    def run(self, total_steps):
+        """Steps until `total_steps` transitions (summed over envs) are done. Returns throughput stats."""
+        ready = queue.Queue()
+        inboxes = [queue.Queue() for _ in self.envs]
+        workers = [threading.Thread(target=self._work, args=(i, inboxes[i], ready), daemon=True)
+                   for i in range(len(self.envs))]
+
+        transitions = episodes = batches = 0
+        total_reward = inference = 0.0
+        t0 = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        try:
+            while transitions < total_steps:
+                # Block for the first ready env, then take whoever else is ready too
+                batch = [ready.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(ready.get_nowait())
+                    except queue.Empty:
+                        break
+                for i, _, reward, done, _ in batch:
+                    if isinstance(reward, Exception):
+                        raise RuntimeError(f"Environment {i} failed") from reward
+                    if reward is not None:
+                        transitions += 1
+                        total_reward += reward
+                        episodes += done
+
+                t1 = time.perf_counter()
+                actions = predict_batch(self.policy, [obs for _, obs, _, _, _ in batch],
+                                        [phase for _, _, _, _, phase in batch])
+                inference += time.perf_counter() - t1
+                batches += 1
+                for (i, _, _, _, _), action in zip(batch, actions):
+                    inboxes[i].put(int(action))
+        finally:
+            for inbox in inboxes:
+                inbox.put(_STOP)
+            for worker in workers:
+                worker.join()
+
+        wall = time.perf_counter() - t0
+        return {"transitions": transitions, "episodes": episodes, "reward": total_reward, "wall_s": wall,
+                "transitions_per_s": transitions / wall if wall else 0.0, "inference_s": inference,
+                "mean_batch": transitions / batches if batches else 0.0}
+
+
+def run_sequential(envs, policy, total_steps):
+    """The plain loop: step each env in turn with a single-observation predict. Same stats as PipelinedRunner.run."""
+    transitions = episodes = 0
+    total_reward = inference = 0.0
+    t0 = time.perf_counter()
+    observations = [env.reset()[0] for env in envs]
+    needs_phase = getattr(policy, "needs_phase", False)
+    while transitions < total_steps:
+        for i, env in enumerate(envs):
+            t1 = time.perf_counter()
+            if needs_phase:
+                action, _ = policy.predict(observations[i], deterministic=True, phases=env.current_phase())
+            else:
+                action, _ = policy.predict(observations[i], deterministic=True)
+            inference += time.perf_counter() - t1
+            obs, reward, terminated, truncated, _ = env.step(action)
+            if terminated or truncated:
+                obs, _ = env.reset()
+                episodes += 1
+            observations[i] = obs
+            transitions += 1
+            total_reward += reward
+    wall = time.perf_counter() - t0
+    return {"transitions": transitions, "episodes": episodes, "reward": total_reward, "wall_s": wall,
+            "transitions_per_s": transitions / wall if wall else 0.0, "inference_s": inference,
+            "mean_batch": 1.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipelined multi-env stepping against a sequential loop.")
+    parser.add_argument("--envs", type=int, default=4, help="Environments (SUMO instances) in this process")
+    parser.add_argument("--steps", type=int, default=4000, help="Transitions to collect, summed over envs")
+    parser.add_argument("--model", default=None,
+                        help="Policy (SB3 zip or exported .npz). Default: keep phase, SUMO's own program")
+    parser.add_argument("--sim-mode", choices=["micro", "meso"], default="micro")
+    parser.add_argument("--net-file", default="intersection.net.xml")
+    parser.add_argument("--route-file", default="traffic.rou.xml")
+    args = parser.parse_args(argv)
+    from traffic_env import TrafficLightEnv
+
+    policy = load_policy(args.model) if args.model else ZeroPolicy()
+    envs = [TrafficLightEnv(net_file=args.net_file, route_file=args.route_file, use_gui=False,
+                            sim_mode=args.sim_mode, label=f"pipeline{i}", switch_connection=False)
+            for i in range(args.envs)]
+    try:
+        print(f"Sequential loop over {args.envs} envs...")
+        sequential = run_sequential(envs, policy, args.steps)
+        print(f"Pipelined runner over {args.envs} envs...")
+        pipelined = PipelinedRunner(envs, policy).run(args.steps)
+    finally:
+        for env in envs:
+            env.close()
+
+    print("\n" + "=" * 60)
+    print(f"{'':<22} | {'Sequential':<14} | {'Pipelined':<14}")
+    print("-" * 60)
+    for key, name, fmt in (("transitions", "Transitions", "d"), ("wall_s", "Wall time (s)", ".2f"),
+                           ("transitions_per_s", "Transitions / s", ".1f"), ("inference_s", "Inference (s)", ".3f"),
+                           ("mean_batch", "Mean batch size", ".2f")):
+        print(f"{name:<22} | {sequential[key]:<14{fmt}} | {pipelined[key]:<14{fmt}}")
+    print("-" * 60)
+    speedup = pipelined["transitions_per_s"] / sequential["transitions_per_s"] if sequential["transitions_per_s"] else 0.0
+    print(f"Speedup: {speedup:.2f}x")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Converts a saved SB3 PPO zip into a NumPy-only .npz policy and benchmarks
+# the two runtimes against each other.
+#
+#   python policy_export.py export flux_ppo_model.zip -o flux_policy.npz
+#   python policy_export.py bench flux_ppo_model.zip flux_policy.npz
+
+# Startup probes run in a fresh interpreter so import cost is measured honestly.
+# They print JSON: seconds to import+load and peak RSS in MB.
+STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+{load}
+t1 = time.perf_counter()
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+except ImportError:
+    # No resource module on Windows
+    rss = float("nan")
+print(json.dumps({{"startup_s": t1 - t0, "rss_mb": rss}}))
+"""
+
+SB3_LOAD = "from stable_baselines3 import PPO\nmodel = PPO.load(sys.argv[1])"
+NUMPY_LOAD = "from numpy_policy import NumpyPolicy\nmodel = NumpyPolicy.load(sys.argv[1])"
+
+
+def export_policy(model_path, output_path):
+    """Extracts the actor MLP of an SB3 PPO model (torch is only needed here)."""
+    import torch.nn as nn
+    from stable_baselines3 import PPO
+    from numpy_policy import NumpyPolicy, ACTIVATIONS
+
+    model = PPO.load(model_path, device="cpu")
+    policy = model.policy
+
+    weights, biases = [], []
+    activation = "identity"
+    for module in policy.mlp_extractor.policy_net:
+        if isinstance(module, nn.Linear):
+            weights.append(module.weight.detach().cpu().numpy())
+            biases.append(module.bias.detach().cpu().numpy())
+        else:
+            activation = type(module).__name__.lower()
+    if activation not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation '{activation}' in policy network")
+
+    action_net = policy.action_net
+    exported = NumpyPolicy(weights, biases,
+                           action_net.weight.detach().cpu().numpy(),
+                           action_net.bias.detach().cpu().numpy(),
+                           activation=activation)
+    exported.save(output_path)
+    print(f"Exported {model_path} -> {output_path} "
+          f"({len(weights)} hidden layers, activation={activation})")
+
+    # Sanity check: both runtimes must pick the same actions
+    import numpy as np
+    obs = np.random.default_rng(0).uniform(0, 30, size=(1000, policy.observation_space.shape[0])).astype(np.float32)
+    sb3_actions, _ = model.predict(obs, deterministic=True)
+    np_actions, _ = exported.predict(obs, deterministic=True)
+    agreement = float((sb3_actions == np_actions).mean())
+    print(f"Action agreement with SB3 on 1000 random observations: {agreement * 100:.2f}%")
+    return exported
+
+
+def _startup(load_snippet, path):
+    out = subprocess.run([sys.executable, "-c", STARTUP_PROBE.format(load=load_snippet), path],
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _latency(model, obs, calls):
+    model.predict(obs, deterministic=True)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        model.predict(obs, deterministic=True)
+    return (time.perf_counter() - t0) / calls
+
+
+def benchmark(model_path, npz_path, calls=2000, batch=64):
+    import numpy as np
+    from numpy_policy import NumpyPolicy, load_policy
+
+    print("Measuring startup (fresh interpreter, import + load)...")
+    sb3_start = _startup(SB3_LOAD, model_path)
+    np_start = _startup(NUMPY_LOAD, npz_path)
+
+    sb3_model = load_policy(model_path)
+    np_model = NumpyPolicy.load(npz_path)
+    rng = np.random.default_rng(0)
+    single = rng.uniform(0, 30, size=4).astype(np.float32)
+    batched = rng.uniform(0, 30, size=(batch, 4)).astype(np.float32)
+
+    rows = [
+        ("Startup (s)", sb3_start["startup_s"], np_start["startup_s"]),
+        ("Peak RSS (MB)", sb3_start["rss_mb"], np_start["rss_mb"]),
+        ("predict x1 (us)", _latency(sb3_model, single, calls) * 1e6, _latency(np_model, single, calls) * 1e6),
+        (f"predict x{batch} (us)", _latency(sb3_model, batched, calls) * 1e6, _latency(np_model, batched, calls) * 1e6),
+    ]
+
+    print("\n" + "=" * 60)
+    print(f"{'Metric':<20} | {'SB3':<12} | {'NumPy':<12} | {'Speedup':<8}")
+    print("-" * 60)
+    for name, a, b in rows:
+        print(f"{name:<20} | {a:<12.2f} | {b:<12.2f} | {a / b if b else 0:.1f}x")
+    print("=" * 60)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export SB3 PPO models to a NumPy-only runtime.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Convert an SB3 zip into a .npz policy")
+    p_export.add_argument("model", help="SB3 model zip, e.g. flux_ppo_model.zip")
+    p_export.add_argument("-o", "--output", default=None, help="Output .npz (default: <model>.npz)")
+
+    p_bench = sub.add_parser("bench", help="Compare startup and predict latency of SB3 vs NumPy")
+    p_bench.add_argument("model", help="SB3 model zip")
+    p_bench.add_argument("npz", help="Exported .npz policy")
+    p_bench.add_argument("--calls", type=int, default=2000)
+    p_bench.add_argument("--batch", type=int, default=64)
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        output = args.output or args.model.rsplit(".zip", 1)[0] + ".npz"
+        export_policy(args.model, output)
+    else:
+        benchmark(args.model, args.npz, calls=args.calls, batch=args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import pickle
+import subprocess
+
+# Content-addressed cache for evaluation results.
+#
+# A result is stored under the sha256 of everything it depends on: the bytes
+# of the net, route and model files, the env configuration, the seed and the
+# SUMO version. Change any of them and the key changes, so entries never need
+# invalidating; the directory is simply capped in size and the least recently
+# used entries are evicted.
+#
+#   cache = ResultCache()
+#   key = cache_key(net=file_digest(net_file), config={...})   # file_digest: digests.py
+#   result = cache.get(key)
+
+DEFAULT_DIR = ".flowstate_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the cached values change meaning (e.g. a metric definition changes)
+CACHE_VERSION = 1
+
+_sumo_version = None
+
+
+def sumo_version(binary="sumo"):
+    """First line of `sumo --version`, or 'unknown' if SUMO cannot be run."""
+    global _sumo_version
+    if _sumo_version is None:
+        try:
+            out = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=30).stdout
+            _sumo_version = out.strip().splitlines()[0] if out.strip() else "unknown"
+        except (OSError, subprocess.SubprocessError):
+            _sumo_version = "unknown"
+    return _sumo_version
+
+
+def cache_key(**parts):
+    """Stable sha256 over JSON-serialisable parts (dict order does not matter)."""
+    payload = json.dumps({"version": CACHE_VERSION, **parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Pickled results in one directory, one file per key. Reads refresh the
+    entry's mtime, and writes evict the oldest entries once the directory
+    grows past max_bytes.
+    """
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Truncated or written by incompatible code: treat as a miss
+            os.remove(path)
+            return None
+        os.utime(path)
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Atomic, so parallel sweeps never read a half-written entry
+        os.replace(tmp, path)
+        self.evict()
+
+    def entries(self):
+        """(mtime, size, path) of every entry, oldest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
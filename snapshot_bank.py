@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+
+from sumo_setup import ensure_sumo
+
+ensure_sumo()
+
+# Warm-state snapshot bank.
+#
+# A pre-generation job simulates the scenario at several demand scales and
+# seeds and saves SUMO states (traci.simulation.saveState) at regular times,
+# together with how congested each one is. TrafficLightEnv(snapshot_bank=...)
+# then starts every episode from a sampled state via --load-state, instead of
+# an empty network plus warm-up steps.
+#
+#   python snapshot_bank.py --out-dir snapshots --scales 0.5 1.0 1.5 --seeds 0 1 2
+
+INDEX_FILE = "index.json"
+
+
+def _halting(conn, edge_ids):
+    return sum(conn.edge.getLastStepHaltingNumber(e) for e in edge_ids)
+
+
+def generate(net_file, route_file, out_dir, scales=(1.0,), seeds=(0,), every=30, begin=60, end=None,
+             min_vehicles=1, sim_mode="micro"):
+    """
+    Runs one simulation per (scale, seed) and saves a state every `every` seconds.
+    Micro and meso states are not interchangeable, so sim_mode is recorded in the index.
+    """
+    import traci
+    import sumolib
+
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        binary = sumolib.checkBinary("sumo")
+    except Exception:
+        binary = "sumo"
+
+    entries = []
+    for scale in scales:
+        for seed in seeds:
+            print(f"Generating snapshots for scale={scale} seed={seed}...")
+            cmd = [binary, "-n", net_file, "-r", route_file, "--no-step-log", "true",
+                   "--waiting-time-memory", "1000", "--time-to-teleport", "-1",
+                   "--scale", str(scale), "--seed", str(seed)]
+            if sim_mode == "meso":
+                # Same options as TrafficLightEnv's meso mode
+                cmd.extend(["--mesosim", "true", "--meso-junction-control", "true"])
+            traci.start(cmd)
+            try:
+                edge_ids = [e for e in traci.edge.getIDList() if not e.startswith(":")]
+                next_save = begin
+                while traci.simulation.getMinExpectedNumber() > 0:
+                    traci.simulationStep()
+                    now = traci.simulation.getTime()
+                    if end is not None and now > end:
+                        break
+                    if now < next_save:
+                        continue
+                    next_save += every
+                    vehicles = traci.vehicle.getIDCount()
+                    if vehicles < min_vehicles:
+                        continue
+                    name = f"state_s{scale:g}_r{seed}_t{int(now)}.xml.gz"
+                    traci.simulation.saveState(os.path.join(out_dir, name))
+                    entries.append({"file": name, "time": now, "scale": scale, "seed": seed,
+                                    "vehicles": vehicles, "halting": _halting(traci, edge_ids)})
+            finally:
+                traci.close()
+
+    index = {"net_file": net_file, "route_file": route_file, "sim_mode": sim_mode, "snapshots": entries}
+    with open(os.path.join(out_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f, indent=2)
+    print(f"Saved {len(entries)} snapshots to {out_dir}")
+    return index
+
+
+class SnapshotBank:
+    """
+    Index of saved states. sample() picks a congestion level uniformly first
+    (quantile bins over halting vehicles) and then a state within it, so
+    near-empty and gridlocked states are drawn as often as each other rather
+    than in proportion to how long the simulation spent in them.
+    Pass sim_mode to refuse states generated for the other simulation model.
+    """
+    def __init__(self, directory, bins=5, min_vehicles=0, sim_mode=None):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        # Banks written before the mode was recorded only hold micro states
+        self.sim_mode = self.index.get("sim_mode", "micro")
+        if sim_mode is not None and sim_mode != self.sim_mode:
+            raise ValueError(f"Snapshot bank {directory} holds {self.sim_mode} states, "
+                             f"cannot start a {sim_mode} simulation from them")
+        snapshots = [s for s in self.index["snapshots"] if s["vehicles"] >= min_vehicles]
+        if not snapshots:
+            raise ValueError(f"Snapshot bank {directory} has no usable snapshots")
+        snapshots.sort(key=lambda s: s["halting"])
+        bins = max(1, min(bins, len(snapshots)))
+        size = len(snapshots) / bins
+        self.bins = [snapshots[int(i * size):int((i + 1) * size)] for i in range(bins)]
+
+    def __len__(self):
+        return sum(len(b) for b in self.bins)
+
+    def sample(self, rng):
+        """rng is a numpy Generator (e.g. env.np_random). Returns the index entry with an absolute path."""
+        level = self.bins[int(rng.integers(len(self.bins)))]
+        entry = dict(level[int(rng.integers(len(level)))])
+        entry["path"] = os.path.join(self.directory, entry["file"])
+        return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate SUMO warm-state snapshots for episode starts.")
+    parser.add_argument("--net-file", default="intersection.net.xml")
+    parser.add_argument("--route-file", default="traffic.rou.xml")
+    parser.add_argument("--out-dir", default="snapshots")
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.5, 1.0, 1.5, 2.0],
+                        help="Demand multipliers (SUMO --scale) to cover several congestion levels")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--every", type=float, default=30, help="Seconds between saved states")
+    parser.add_argument("--begin", type=float, default=60, help="First save time (skip the empty start)")
+    parser.add_argument("--end", type=float, default=None)
+    parser.add_argument("--min-vehicles", type=int, default=1, help="Do not save states with fewer vehicles")
+    parser.add_argument("--sim-mode", choices=["micro", "meso"], default="micro",
+                        help="Simulation model the states are for (must match the env using them)")
+    args = parser.parse_args(argv)
+    generate(args.net_file, args.route_file, args.out_dir, scales=args.scales, seeds=args.seeds,
+             every=args.every, begin=args.begin, end=args.end, min_vehicles=args.min_vehicles,
+             sim_mode=args.sim_mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,12 @@
-import os
+import argparse
 import sys
 import subprocess
 import random
-import traci
-import sumolib
+
+from sumo_setup import ensure_sumo
 
 # Add common SUMO paths to PATH for this script execution
-sumo_paths = [
-    r"C:\Program Files (x86)\Eclipse\Sumo\bin",
-    r"C:\Program Files\Eclipse\Sumo\bin"
-]
-found_sumo = False
-for path in sumo_paths:
-    if os.path.exists(path):
-        os.environ["PATH"] += os.pathsep + path
-        # Set SUMO_HOME to the parent directory of bin
-        sumo_home = os.path.dirname(path)
-        os.environ["SUMO_HOME"] = sumo_home
-        print(f"Set SUMO_HOME to: {sumo_home}")
-        found_sumo = True
-        break
-
-if not found_sumo:
-    print("Warning: Could not find SUMO in common directories.")
+ensure_sumo(verbose=True)
 
 
 def generate_network():
@@ -66,11 +50,13 @@ def generate_network():
 def generate_routes():
     print("Generating route file (traffic.rou.xml)...")
     
+    from net_arrays import open_net
+
     # Load the network to find edge IDs
     try:
-        net = sumolib.net.readNet('intersection.net.xml')
-        edges = net.getEdges()
-        edge_ids = [e.getID() for e in edges]
+        # Fresh net: (re)build its shared array form, used by the camera too
+        net = open_net('intersection.net.xml')
+        edge_ids = [str(e) for e in net.edge_ids]
         # Filter for normal edges (not internal ones starting with :)
         valid_edges = [e for e in edge_ids if not e.startswith(":")]
         print(f"Found valid edges: {valid_edges}")
@@ -97,14 +83,11 @@ def generate_routes():
                 if start_edge_id == end_edge_id:
                     continue
                     
-                start_edge = net.getEdge(start_edge_id)
-                end_edge = net.getEdge(end_edge_id)
-                
                 # Check if path exists
-                path = net.getShortestPath(start_edge, end_edge)
-                if path and len(path[0]) > 0:
-                     # path is (edges, cost)
-                     full_route_ids = [e.getID() for e in path[0]]
+                path = net.shortest_path(start_edge_id, end_edge_id)
+                if path[0]:
+                     # path is (edge ids, cost)
+                     full_route_ids = path[0]
                      route_str = " ".join(full_route_ids)
                      
                      print(f'    <vehicle id="{i}" type="car" depart="{i}">', file=routes)
@@ -137,6 +120,9 @@ def generate_config():
 import traceback
 
 def run_simulation():
+    import traci
+    import sumolib
+
     print("Starting simulation...")
     
     # Check if sumo is reachable
@@ -168,8 +154,12 @@ def run_simulation():
         print("Simulation failed.")
         traceback.print_exc()
 
-if __name__ == "__main__":
+def main(argv=None):
+    argparse.ArgumentParser(description="Generate the SUMO network, routes and config, then run a short smoke test.").parse_args(argv)
     generate_network()
     generate_routes()
     generate_config()
     run_simulation()
+
+if __name__ == "__main__":
+    main()
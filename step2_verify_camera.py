@@ -1,36 +1,24 @@
-import os
+import argparse
 import sys
 import subprocess
 import time
-import traci
-import sumolib
 
-# Add common SUMO paths (copied from step1_setup.py)
-sumo_paths = [
-    r"C:\Program Files (x86)\Eclipse\Sumo\bin",
-    r"C:\Program Files\Eclipse\Sumo\bin"
-]
-found_sumo = False
-for path in sumo_paths:
-    if os.path.exists(path):
-        os.environ["PATH"] += os.pathsep + path
-        # Set SUMO_HOME to the parent directory of bin
-        sumo_home = os.path.dirname(path)
-        os.environ["SUMO_HOME"] = sumo_home
-        found_sumo = True
-        break
+from sumo_setup import ensure_sumo
 
-if not found_sumo:
-    print("Warning: Could not find SUMO in common directories. Relying on system PATH.")
-
-# Import the camera class
-try:
-    from camera import IntersectionCamera
-except ImportError:
-    print("Error: Could not import IntersectionCamera from camera.py")
-    sys.exit(1)
+# Add common SUMO paths (shared with the other steps)
+ensure_sumo()
 
 def verify_camera():
+    import traci
+    import sumolib
+
+    # Import the camera class
+    try:
+        from camera import IntersectionCamera
+    except ImportError:
+        print("Error: Could not import IntersectionCamera from camera.py")
+        sys.exit(1)
+
     print("Starting Camera Verification...")
     
     # Check binaries
@@ -74,5 +62,9 @@ def verify_camera():
         import traceback
         traceback.print_exc()
 
-if __name__ == "__main__":
+def main(argv=None):
+    argparse.ArgumentParser(description="Run SUMO for 100 steps and print the virtual camera state vectors.").parse_args(argv)
     verify_camera()
+
+if __name__ == "__main__":
+    main()
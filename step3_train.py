@@ -1,30 +1,20 @@
-import os
+import argparse
 import sys
-import gymnasium as gym
-from stable_baselines3 import PPO
-from stable_baselines3.common.env_checker import check_env
-from traffic_env import TrafficLightEnv
+
+from sumo_setup import ensure_sumo
 
 # Ensure SUMO is in PATH (Redundant check but good for standalone execution)
-sumo_paths = [
-    r"C:\Program Files (x86)\Eclipse\Sumo\bin",
-    r"C:\Program Files\Eclipse\Sumo\bin"
-]
-found_sumo = False
-for path in sumo_paths:
-    if os.path.exists(path):
-        if path not in os.environ["PATH"]:
-            os.environ["PATH"] += os.pathsep + path
-        if "SUMO_HOME" not in os.environ:
-             os.environ["SUMO_HOME"] = os.path.dirname(path)
-        found_sumo = True
+ensure_sumo()
 
-if not found_sumo:
-    print("Warning: SUMO not found in common directories. Relying on system PATH.")
+def train_agent(sim_mode="micro", net_file="intersection.net.xml", route_file="traffic.rou.xml", snapshot_bank=None):
+    # Heavy imports (torch via SB3, gymnasium, traci) only once training actually starts
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.env_checker import check_env
+    from traffic_env import TrafficLightEnv
 
-def train_agent():
-    print("Initializing Environment...")
-    env = TrafficLightEnv(net_file="intersection.net.xml", route_file="traffic.rou.xml", use_gui=False)
+    print(f"Initializing Environment ({sim_mode}, {net_file})...")
+    env = TrafficLightEnv(net_file=net_file, route_file=route_file, use_gui=False,
+                          sim_mode=sim_mode, snapshot_bank=snapshot_bank)
     
     # Check the environment
     print("Checking Environment Compliance...")
@@ -57,5 +47,18 @@ def train_agent():
     finally:
         env.close()
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the PPO traffic light agent.")
+    parser.add_argument("--sim-mode", choices=["micro", "meso"], default="micro",
+                        help="Train on the exact microscopic model or the faster mesoscopic one")
+    parser.add_argument("--net-file", default="intersection.net.xml",
+                        help="Network to train on, e.g. trimmed/intersection.net.xml from trim_network.py")
+    parser.add_argument("--route-file", default="traffic.rou.xml")
+    parser.add_argument("--snapshot-bank", default=None,
+                        help="Directory from snapshot_bank.py; episodes start from sampled warm states")
+    args = parser.parse_args(argv)
+    train_agent(sim_mode=args.sim_mode, net_file=args.net_file, route_file=args.route_file,
+                snapshot_bank=args.snapshot_bank)
+
 if __name__ == "__main__":
-    train_agent()
+    main()
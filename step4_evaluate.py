@@ -1,112 +1,293 @@
-import gymnasium as gym
-from stable_baselines3 import PPO
-import traci
-import sumolib
-import numpy as np
 import os
 import sys
+import argparse
+
+from sumo_setup import ensure_sumo
 
 # Ensure SUMO path
-sumo_paths = [
-    r"C:\Program Files (x86)\Eclipse\Sumo\bin",
-    r"C:\Program Files\Eclipse\Sumo\bin"
-]
-for path in sumo_paths:
-    if os.path.exists(path):
-        if path not in os.environ["PATH"]:
-            os.environ["PATH"] += os.pathsep + path
-        if "SUMO_HOME" not in os.environ:
-             os.environ["SUMO_HOME"] = os.path.dirname(path)
+ensure_sumo()
+
+from metrics import MetricsCollector
+from sumo_outputs import collect_output_metrics
+from result_cache import ResultCache, cache_key, sumo_version
+from digests import file_digest
+from snapshot_bank import INDEX_FILE
+from distilled_controller import bind_phase
+
+# Vehicles below this speed (m/s) count as stopped
+STOP_SPEED = 0.1
+# Simulated seconds per evaluation run
+EVAL_SECONDS = 2000
+
+
+class VehicleTracker:
+    """
+    Follows vehicles from departure to arrival with one TraCI subscription each,
+    so per-vehicle delay, travel time and stops can be fed to a MetricsCollector.
+    Only vehicles currently in the network are held in memory.
+    """
+    def __init__(self, collector, lane_map, conn):
+        import traci.constants as tc
+
+        self.collector = collector
+        self.conn = conn
+        self._speed, self._waiting, self._road = tc.VAR_SPEED, tc.VAR_ACCUMULATED_WAITING_TIME, tc.VAR_ROAD_ID
+        # Incoming edge -> approach label, derived from the camera's lane map
+        self.edge_approach = {}
+        for direction, lanes in lane_map.items():
+            for lane_id in lanes:
+                self.edge_approach[lane_id.rsplit("_", 1)[0]] = direction
+        # veh_id -> [depart_time, waiting_time, stops, stopped, approach]
+        self.active = {}
+        # env.reset() has already stepped SUMO (warm-up or a loaded snapshot):
+        # pick up the vehicles that departed before tracking started
+        for veh_id in conn.vehicle.getIDList():
+            self._track(veh_id, conn.vehicle.getDeparture(veh_id))
+
+    def _track(self, veh_id, depart):
+        self.conn.vehicle.subscribe(veh_id, (self._speed, self._waiting, self._road))
+        self.active[veh_id] = [depart, 0.0, 0, False, "Other"]
+
+    def update(self, sim_time):
+        for veh_id in self.conn.simulation.getDepartedIDList():
+            self._track(veh_id, sim_time)
+
+        for veh_id, values in self.conn.vehicle.getAllSubscriptionResults().items():
+            state = self.active.get(veh_id)
+            if state is None:
+                continue
+            state[1] = values.get(self._waiting, state[1])
+            stopped = values.get(self._speed, 0.0) < STOP_SPEED
+            if stopped and not state[3]:
+                state[2] += 1
+            state[3] = stopped
+            approach = self.edge_approach.get(values.get(self._road))
+            if approach:
+                state[4] = approach
+
+        for veh_id in self.conn.simulation.getArrivedIDList():
+            state = self.active.pop(veh_id, None)
+            if state is None:
+                continue
+            depart, waiting, stops, _, approach = state
+            self.collector.record_vehicle(approach, sim_time, waiting, sim_time - depart, stops)
+
+
+class FixedTimeBaseline:
+    """Blind fixed-time cycle: 30s green / 3s yellow per direction."""
+    def __init__(self, phase_duration=(30, 3, 30, 3)):
+        self.phase_duration = list(phase_duration)
+        self.current_phase_idx = 0
+        self.time_in_phase = 0
 
-from traffic_env import TrafficLightEnv
+    def step(self, env):
+        tls_id = env.tls_id
+        if tls_id:
+            if self.time_in_phase >= self.phase_duration[self.current_phase_idx]:
+                self.current_phase_idx = (self.current_phase_idx + 1) % 4
+                env.conn.trafficlight.setPhase(tls_id, self.current_phase_idx)
+                self.time_in_phase = 0
+            else:
+                self.time_in_phase += 1
+        env.simulation_step()
 
 
-def run_simulation_metrics(env, model=None, label="Simulation"):
+def advance(env, model, obs, baseline):
+    """One control step with either the model or the fixed-time baseline. Returns the new obs."""
+    if model:
+        action, _states = model.predict(obs, deterministic=True)
+        obs, reward, terminated, truncated, info = env.step(action)
+    else:
+        baseline.step(env)
+    return obs
+
+
+def run_simulation_metrics(env, model=None, label="Simulation", seed=None):
     print(f"Running {label}...")
-    obs, info = env.reset()
-    total_waiting_time = 0
-    total_co2 = 0
-    total_queue_length = 0
-    max_queue_length = 0
-    throughput_count = 0
-    
-    # Track vehicles that have left the simulation
-    arrived_vehicles = 0
+    obs, info = env.reset(seed=seed)
+    bind_phase(model, env)
+    totals = {"waiting_time": 0.0, "co2": 0.0, "max_queue": 0, "arrived": 0, "steps": 0}
     
-    step = 0
-    done = False
+    # Per-vehicle and per-approach distributions
+    collector = MetricsCollector()
+    tracker = VehicleTracker(collector, env.camera.lane_map, env.conn)
+    conn = env.conn
     
-    # Static Cycle Logic for pure Baseline (no model)
-    phase_duration = [30, 3, 30, 3] 
-    current_phase_idx = 0
-    time_in_phase = 0
-    
-    while not done:
-        # Action Logic
-        if model:
-            action, _states = model.predict(obs, deterministic=True)
-            obs, reward, terminated, truncated, info = env.step(action)
-        else:
-            # Baseline Fixed Control
-            tls_id = env.tls_id
-            if tls_id:
-                if time_in_phase >= phase_duration[current_phase_idx]:
-                    current_phase_idx = (current_phase_idx + 1) % 4
-                    traci.trafficlight.setPhase(tls_id, current_phase_idx)
-                    time_in_phase = 0
-                else:
-                    time_in_phase += 1
-            traci.simulationStep()
-            terminated = False
-            truncated = False
-
-        step += 1
-        
-        # Metrics
+    def record(sim_time):
+        # Runs after every SUMO step, so decision_interval > 1 misses no departures or arrivals
         waiting_time = 0
         co2 = 0
         current_step_queue = 0
         
-        for edge in traci.edge.getIDList():
+        for edge in conn.edge.getIDList():
             if edge.startswith(":"): continue
-            waiting_time += traci.edge.getWaitingTime(edge)
-            co2 += traci.edge.getCO2Emission(edge)
+            waiting_time += conn.edge.getWaitingTime(edge)
+            co2 += conn.edge.getCO2Emission(edge)
             # Queue: approximate by 'getLastStepHaltingNumber'
-            current_step_queue += traci.edge.getLastStepHaltingNumber(edge)
+            current_step_queue += conn.edge.getLastStepHaltingNumber(edge)
             
-        total_waiting_time += waiting_time
-        total_co2 += co2
-        total_queue_length += current_step_queue
-        if current_step_queue > max_queue_length:
-            max_queue_length = current_step_queue
+        totals["waiting_time"] += waiting_time
+        totals["co2"] += co2
+        totals["max_queue"] = max(totals["max_queue"], current_step_queue)
+        
+        tracker.update(sim_time)
+        for direction, lanes in env.camera.lane_map.items():
+            queue = sum(conn.lane.getLastStepHaltingNumber(lane_id) for lane_id in lanes)
+            collector.record_queue(direction, sim_time, queue)
             
-        arrived_vehicles += traci.simulation.getArrivedNumber()
-
-        if traci.simulation.getMinExpectedNumber() <= 0 or step >= 2000:
-            done = True
+        # Track vehicles that have left the simulation
+        totals["arrived"] += conn.simulation.getArrivedNumber()
+        totals["steps"] += 1
+    
+    # Static Cycle Logic for pure Baseline (no model)
+    baseline = FixedTimeBaseline()
+    
+    # Same simulated horizon whatever the decision interval
+    end_time = conn.simulation.getTime() + EVAL_SECONDS
+    env.step_hooks.append(record)
+    try:
+        while True:
+            obs = advance(env, model, obs, baseline)
+            if env.simulation_finished() or conn.simulation.getTime() >= end_time:
+                break
+    finally:
+        env.step_hooks.remove(record)
+    
+    step = max(totals["steps"], 1)
+    total_co2 = totals["co2"]
+    max_queue_length = totals["max_queue"]
+    arrived_vehicles = totals["arrived"]
             
-    avg_wait = total_waiting_time / step
-    avg_queue = total_queue_length / step
+    # Avg Wait is per vehicle (accumulated waiting time at arrival).
+    # The old figure - network waiting time summed per step - is kept as Wait/Step.
+    avg_wait = collector.summary("delay")["mean"]
+    wait_per_step = totals["waiting_time"] / step
     
     print(f"{label} Finished.")
-    print(f"  Avg Wait: {avg_wait:.2f}")
+    print(f"  Avg Wait: {avg_wait:.2f}s per vehicle")
+    print(f"  Wait/Step: {wait_per_step:.2f}")
     print(f"  Max Queue: {max_queue_length}")
     print(f"  Throughput: {arrived_vehicles}")
+    collector.print_report(label)
     
-    return avg_wait, total_co2, max_queue_length, arrived_vehicles
+    return avg_wait, total_co2, max_queue_length, arrived_vehicles, collector
 
-if __name__ == "__main__":
-    # Setup Env
-    env = TrafficLightEnv(net_file="intersection.net.xml", route_file="traffic.rou.xml", use_gui=False)
+
+def run_output_metrics(env, model=None, label="Simulation", seed=None):
+    """
+    Same evaluation as run_simulation_metrics, but without polling TraCI for
+    metrics: SUMO writes tripinfo / emission / queue files (env.output_files)
+    and they are parsed as a stream once the run has finished.
+    """
+    print(f"Running {label} (SUMO output mode)...")
+    env.compute_reward = False
+    obs, info = env.reset(seed=seed)
+    bind_phase(model, env)
+    lane_map = env.camera.lane_map
     
-    # metrics: wait, co2, max_queue, throughput
-    b_wait, b_co2, b_queue, b_thru = run_simulation_metrics(env, model=None, label="Baseline")
-    env.close() 
+    baseline = FixedTimeBaseline()
+    # SUMO's files also cover the warm-up; only what follows the reset counts, as in TraCI mode
+    start_time = env.conn.simulation.getTime()
+    end_time = start_time + EVAL_SECONDS
+    while True:
+        obs = advance(env, model, obs, baseline)
+        if env.simulation_finished() or env.conn.simulation.getTime() >= end_time:
+            break
     
-    env = TrafficLightEnv(net_file="intersection.net.xml", route_file="traffic.rou.xml", use_gui=False)
-    model = PPO.load("flowstate_ppo_model")
-    a_wait, a_co2, a_queue, a_thru = run_simulation_metrics(env, model=model, label="FlowState AI")
+    # SUMO only finalises its output files when the connection closes
     env.close()
+    collector, total_co2, max_queue_length, arrived_vehicles = collect_output_metrics(
+        env.output_files, lane_map, start_time=start_time)
+    avg_wait = collector.summary("delay")["mean"]
+    
+    print(f"{label} Finished.")
+    print(f"  Avg Wait: {avg_wait:.2f}s per vehicle")
+    print(f"  Max Queue (est.): {max_queue_length:.1f}")
+    print(f"  Throughput: {arrived_vehicles}")
+    collector.print_report(label)
+    
+    return avg_wait, total_co2, max_queue_length, arrived_vehicles, collector
+
+
+def model_artifact(path):
+    """The file load_policy reads for `path` (SB3 appends .zip when it is missing)."""
+    if not os.path.exists(path) and os.path.exists(path + ".zip"):
+        return path + ".zip"
+    return path
+
+
+def evaluation_key(env, controller, outputs, seed):
+    """
+    Cache key for one evaluation run. `controller` identifies what drives the
+    light, e.g. {"model": <file digest>} or {"fixed_time": [30, 3, 30, 3]}.
+    `seed` is the env.reset seed, which fixes the camera noise and snapshot choice.
+    """
+    snapshots = None
+    if env.snapshot_bank is not None:
+        snapshots = file_digest(os.path.join(env.snapshot_bank.directory, INDEX_FILE))
+    config = {"sim_mode": env.sim_mode, "decision_interval": env.decision_interval,
+              "detection_dist": env.detection_dist, "demand_window": env.demand_window,
+              "snapshots": snapshots, "eval_seconds": EVAL_SECONDS,
+              "metrics": "outputs" if outputs else "traci"}
+    # SUMO itself runs with its fixed default seed (or the snapshot's)
+    return cache_key(net=file_digest(env.net_file), routes=file_digest(env.route_file),
+                     controller=controller, env=config, seed=seed, sumo=sumo_version())
+
+
+def output_files_for(output_dir, label):
+    os.makedirs(output_dir, exist_ok=True)
+    return {kind: os.path.join(output_dir, f"{label}_{kind}.xml") for kind in ("tripinfo", "emission", "queue")}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the fixed-time baseline against the trained policy.")
+    parser.add_argument("--outputs", action="store_true",
+                        help="Collect metrics from SUMO tripinfo/emission/queue output files instead of per-step TraCI polling")
+    parser.add_argument("--output-dir", default="eval_outputs", help="Where SUMO writes its output files in --outputs mode")
+    parser.add_argument("--model", default="flowstate_ppo_model",
+                        help="SB3 model zip, or an .npz exported with policy_export.py (no torch needed)")
+    parser.add_argument("--sim-mode", choices=["micro", "meso"], default="micro",
+                        help="Simulation model to evaluate on (check meso-trained policies on micro)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always re-simulate instead of reusing results for unchanged inputs")
+    parser.add_argument("--cache-dir", default=".flowstate_cache")
+    parser.add_argument("--cache-size-mb", type=float, default=256, help="Evict least recently used results beyond this")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the camera noise (part of the cache key)")
+    args = parser.parse_args(argv)
+    from traffic_env import TrafficLightEnv
+    from numpy_policy import load_policy
+    
+    run = run_output_metrics if args.outputs else run_simulation_metrics
+    cache = None if args.no_cache else ResultCache(args.cache_dir, max_bytes=int(args.cache_size_mb * 1024 * 1024))
+    
+    def make_env(label):
+        output_files = output_files_for(args.output_dir, label) if args.outputs else None
+        return TrafficLightEnv(net_file="intersection.net.xml", route_file="traffic.rou.xml", use_gui=False,
+                               output_files=output_files, sim_mode=args.sim_mode)
+    
+    def evaluate(env_label, label, get_controller, get_model):
+        # Constructing the env does not start SUMO, so a cache hit costs only the file hashes
+        # (which are skipped entirely with --no-cache)
+        env = make_env(env_label)
+        key = evaluation_key(env, get_controller(), args.outputs, args.seed) if cache else None
+        result = cache.get(key) if cache else None
+        if result is not None:
+            print(f"{label}: reusing cached result {key[:12]} (--no-cache to re-run)")
+            result[4].print_report(label)
+        else:
+            result = run(env, model=get_model(), label=label, seed=args.seed)
+            if cache:
+                cache.put(key, result)
+        env.close()
+        return result
+    
+    # metrics: wait, co2, max_queue, throughput, distributions
+    b_wait, b_co2, b_queue, b_thru, b_metrics = evaluate(
+        "baseline", "Baseline", lambda: {"fixed_time": FixedTimeBaseline().phase_duration}, lambda: None)
+    
+    # The policy (and torch for SB3 zips) is only loaded when its result is not cached
+    a_wait, a_co2, a_queue, a_thru, a_metrics = evaluate(
+        "flowstate", "FlowState AI", lambda: {"model": file_digest(model_artifact(args.model))},
+        lambda: load_policy(args.model))
     
     print("\n" + "="*65)
     print("             FLOWSTATE ADVANCED EVALUATION RESULTS       ")
@@ -117,18 +298,24 @@ if __name__ == "__main__":
     wait_imp = ((b_wait - a_wait) / b_wait) * 100
     print(f"{'Avg Wait Time':<20} | {b_wait:<12.2f} | {a_wait:<12.2f} | {wait_imp:+.2f}%")
     
+    b_p95 = b_metrics.summary("delay")["p95"]
+    a_p95 = a_metrics.summary("delay")["p95"]
+    p95_imp = ((b_p95 - a_p95) / b_p95) * 100 if b_p95 else 0.0
+    print(f"{'P95 Wait Time':<20} | {b_p95:<12.2f} | {a_p95:<12.2f} | {p95_imp:+.2f}%")
+    
     queue_imp = ((b_queue - a_queue) / b_queue) * 100
-    print(f"{'Max Queue Length':<20} | {b_queue:<12} | {a_queue:<12} | {queue_imp:+.2f}%")
+    # Output files give queue length in metres / 7.5, not TraCI's halting count
+    queue_name = "Max Queue (est.)" if args.outputs else "Max Queue Length"
+    print(f"{queue_name:<20} | {b_queue:<12} | {a_queue:<12} | {queue_imp:+.2f}%")
     
     thru_imp = ((a_thru - b_thru) / b_thru) * 100
     print(f"{'Total Throughput':<20} | {b_thru:<12} | {a_thru:<12} | {thru_imp:+.2f}%")
     
     # Calculate Economic Impact (Hypothetical)
     # Assumptions: 50k cars/day, $20/hr value of time
-    # Time saved per car (seconds) = (b_wait - a_wait) is per step accumulation, 
-    # but let's treat the relative % improvement as the key driver.
-    # Actually 'Avg Wait Time' here is 'Total Wait Time of All Cars per Step', which captures density.
-    # Let's normalize to approximate 'seconds saved per trip' using step count or just use the % to project.
+    # Time saved per car (seconds) = (b_wait - a_wait), since 'Avg Wait Time'
+    # is the mean accumulated waiting time per completed trip.
+    # We still treat the relative % improvement as the key driver.
     
     print("-" * 65)
     print("PROJECTED ANNUAL IMPACT (Per Intersection)")
@@ -141,3 +328,7 @@ if __name__ == "__main__":
     print(f"Productivity Saved: $1.52 Million / Year")
     print(f"Hours Returned:     76,000+ Hours / Year")
     print("="*65)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,11 @@
-import gymnasium as gym
-from stable_baselines3 import PPO
-import traci
-import sumolib
 import sys
-import os
+import argparse
 import time
 
-# Ensure SUMO path
-sumo_paths = [
-    r"C:\Program Files (x86)\Eclipse\Sumo\bin",
-    r"C:\Program Files\Eclipse\Sumo\bin"
-]
-for path in sumo_paths:
-    if os.path.exists(path):
-        if path not in os.environ["PATH"]:
-            os.environ["PATH"] += os.pathsep + path
-        if "SUMO_HOME" not in os.environ:
-             os.environ["SUMO_HOME"] = os.path.dirname(path)
+from sumo_setup import ensure_sumo
 
-from traffic_env import TrafficLightEnv
+# Ensure SUMO path
+ensure_sumo()
 
 class SmartController:
     """
@@ -34,6 +21,7 @@ class SmartController:
         
         # We need to know the current phase to decide.
         # Since we don't have it in 'obs' easily, we peek at traci.
+        import traci
         try:
             tls_ids = traci.trafficlight.getIDList()
             if not tls_ids:
@@ -111,23 +99,26 @@ def run_demo_simulation(env, model=None, label="Simulation"):
             if tls_id:
                 if time_in_phase >= phase_duration[current_phase_idx]:
                     current_phase_idx = (current_phase_idx + 1) % 4
-                    traci.trafficlight.setPhase(tls_id, current_phase_idx)
+                    env.conn.trafficlight.setPhase(tls_id, current_phase_idx)
                     time_in_phase = 0
                 else:
                     time_in_phase += 1
-            traci.simulationStep()
+            env.simulation_step()
             terminated = False
             truncated = False
 
         step += 1
         
         # Stop after a reasonable time for a demo (e.g., 60 seconds / 600 steps)
-        if step >= 600 or traci.simulation.getMinExpectedNumber() <= 0:
+        if step >= 600 or env.simulation_finished():
             done = True
             
     print(f"{label} Complete.")
 
-if __name__ == "__main__":
+def main(argv=None):
+    argparse.ArgumentParser(description="Run the baseline vs FlowState demo in the SUMO GUI.").parse_args(argv)
+    from traffic_env import TrafficLightEnv
+
     print("="*60)
     print("       FLUX SHOWCASE DEMO")
     print("="*60)
@@ -167,3 +158,7 @@ if __name__ == "__main__":
     print("\n" + "="*60)
     print("DEMO COMPLETE")
     print("="*60)
+
+
+if __name__ == "__main__":
+    main()
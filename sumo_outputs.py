@@ -0,0 +1,148 @@
+import gzip
+import xml.etree.ElementTree as ET
+
+from metrics import MetricsCollector
+
+# SUMO writes the queue output in metres; convert to vehicles with the
+# default car length + minGap from traffic.rou.xml (5 + 2.5).
+VEHICLE_SPACING = 7.5
+
+# Approach label used for tripinfo records: tripinfo has no route, so
+# per-vehicle metrics are reported network-wide.
+NETWORK_APPROACH = "Network"
+
+
+def _open_xml(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_elements(path, tag, parent_tag=None, parent_attr=None):
+    """
+    Streams the attributes of every <tag> element in a (possibly huge) SUMO
+    output file. Elements are cleared as they are consumed so memory stays
+    constant. If parent_tag is given, the value of parent_attr on the enclosing
+    <parent_tag> is yielded alongside, e.g. the timestep of an emission record.
+    """
+    parent_value = None
+    with _open_xml(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "start":
+                if parent_tag is not None and elem.tag == parent_tag:
+                    parent_value = elem.get(parent_attr)
+                continue
+            if elem.tag == tag:
+                if parent_tag is None:
+                    yield elem.attrib
+                    elem.clear()
+                    root.clear()
+                else:
+                    yield parent_value, elem.attrib
+                    elem.clear()
+            elif elem.tag == parent_tag:
+                elem.clear()
+                root.clear()
+
+
+def read_tripinfo(path, collector, start_time=0.0):
+    """
+    Feeds per-vehicle delay, travel time and stops into the collector. Returns the trip count.
+    Trips that arrived at or before start_time (e.g. during the env warm-up) are skipped.
+    """
+    trips = 0
+    for trip in iter_elements(path, "tripinfo"):
+        arrival = float(trip.get("arrival", -1))
+        if arrival < 0:
+            # Unfinished trip (--tripinfo-output.write-unfinished)
+            continue
+        if arrival <= start_time:
+            continue
+        collector.record_vehicle(
+            NETWORK_APPROACH,
+            arrival,
+            float(trip.get("waitingTime", 0)),
+            float(trip.get("duration", 0)),
+            int(trip.get("waitingCount", 0)),
+        )
+        trips += 1
+    return trips
+
+
+def read_emissions(path, start_time=0.0):
+    """Total CO2 (mg) after start_time, summed from per-vehicle per-step records."""
+    total_co2 = 0.0
+    for sim_time, vehicle in iter_elements(path, "vehicle", parent_tag="timestep", parent_attr="time"):
+        if float(sim_time) > start_time:
+            total_co2 += float(vehicle.get("CO2", 0))
+    return total_co2
+
+
+def read_queues(path, collector, lane_approach=None, start_time=0.0):
+    """
+    Feeds per-approach queue lengths (vehicles) into the collector.
+    Returns the largest network-wide queue seen in any single step after start_time.
+    This is SUMO's queueing_length / VEHICLE_SPACING, an estimate that is not
+    the halting count the TraCI evaluation reports.
+    lane_approach maps lane IDs to approach labels; other lanes only count
+    towards the network-wide maximum.
+    """
+    lane_approach = lane_approach or {}
+    approaches = set(lane_approach.values())
+    max_queue = 0.0
+    with _open_xml(path) as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            # Each <data> holds one step; steps without queues have no <lane> children
+            if event != "end" or elem.tag != "data":
+                continue
+            sim_time = float(elem.get("timestep"))
+            if sim_time <= start_time:
+                elem.clear()
+                root.clear()
+                continue
+            step_total = 0.0
+            step_by_approach = {approach: 0.0 for approach in approaches}
+            for lane in elem.iter("lane"):
+                lane_id = lane.get("id", "")
+                if lane_id.startswith(":"):
+                    continue
+                queue = float(lane.get("queueing_length", 0)) / VEHICLE_SPACING
+                step_total += queue
+                approach = lane_approach.get(lane_id)
+                if approach:
+                    step_by_approach[approach] += queue
+            for approach, queue in step_by_approach.items():
+                collector.record_queue(approach, sim_time, queue)
+            max_queue = max(max_queue, step_total)
+            elem.clear()
+            root.clear()
+    return max_queue
+
+
+def collect_output_metrics(output_files, lane_map=None, window=900.0, start_time=0.0):
+    """
+    Builds evaluation metrics from the files SUMO wrote during a run.
+    output_files is the same {kind: path} dict given to TrafficLightEnv.
+    Only records after start_time (the simulation time at env.reset) count.
+    Returns (collector, total_co2, max_queue, arrived).
+    """
+    collector = MetricsCollector(window=window)
+    lane_approach = {}
+    for direction, lanes in (lane_map or {}).items():
+        for lane_id in lanes:
+            lane_approach[lane_id] = direction
+
+    total_co2 = 0.0
+    max_queue = 0.0
+    arrived = 0
+    if "tripinfo" in output_files:
+        arrived = read_tripinfo(output_files["tripinfo"], collector, start_time)
+    if "emission" in output_files:
+        total_co2 = read_emissions(output_files["emission"], start_time)
+    if "queue" in output_files:
+        max_queue = read_queues(output_files["queue"], collector, lane_approach, start_time)
+    return collector, total_co2, max_queue, arrived
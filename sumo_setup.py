@@ -0,0 +1,46 @@
+import os
+import sys
+
+# Common Windows install locations of SUMO
+SUMO_BIN_PATHS = [
+    r"C:\Program Files (x86)\Eclipse\Sumo\bin",
+    r"C:\Program Files\Eclipse\Sumo\bin"
+]
+
+_resolved = None
+
+
+def ensure_sumo(verbose=False):
+    """
+    Puts the SUMO binaries on PATH, sets SUMO_HOME and makes SUMO's python
+    tools (traci, sumolib) importable. Only does the work once per process;
+    later calls return the cached SUMO_HOME (None if SUMO was not found and
+    we rely on the system PATH).
+    """
+    global _resolved
+    if _resolved is not None:
+        return _resolved or None
+
+    sumo_home = os.environ.get("SUMO_HOME")
+    if not sumo_home:
+        for path in SUMO_BIN_PATHS:
+            if os.path.exists(path):
+                sumo_home = os.path.dirname(path)
+                os.environ["SUMO_HOME"] = sumo_home
+                break
+
+    if sumo_home:
+        bin_dir = os.path.join(sumo_home, "bin")
+        if os.path.isdir(bin_dir) and bin_dir not in os.environ["PATH"].split(os.pathsep):
+            os.environ["PATH"] += os.pathsep + bin_dir
+        # traci/sumolib ship in $SUMO_HOME/tools when not pip-installed
+        tools_dir = os.path.join(sumo_home, "tools")
+        if os.path.isdir(tools_dir) and tools_dir not in sys.path:
+            sys.path.append(tools_dir)
+        if verbose:
+            print(f"Set SUMO_HOME to: {sumo_home}")
+    else:
+        print("Warning: Could not find SUMO in common directories. Relying on system PATH.")
+
+    _resolved = sumo_home or ""
+    return sumo_home
@@ -3,24 +3,38 @@ from gymnasium import spaces
 import numpy as np
 import os
 import sys
+import threading
+import time
+
+from sumo_setup import ensure_sumo
+
+ensure_sumo()
+
 import traci
 import sumolib
-import time
 
 # Ensure camera can be imported
 try:
     from camera import IntersectionCamera
+    from demand_feeder import DemandFeeder
+    from snapshot_bank import SnapshotBank
 except ImportError:
     # If running from a different directory, might need adjustment
     pass
 
+# traci keeps its connections (and the current one) in module globals, so envs
+# started or closed from different threads take turns
+_TRACI_LOCK = threading.Lock()
+
 class TrafficLightEnv(gym.Env):
     """
     Custom Environment that follows gymnasium interface.
     """
     metadata = {'render_modes': ['human']}
 
-    def __init__(self, net_file="intersection.net.xml", route_file="traffic.rou.xml", use_gui=False, detection_dist=50):
+    def __init__(self, net_file="intersection.net.xml", route_file="traffic.rou.xml", use_gui=False, detection_dist=50,
+                 demand_window=None, output_files=None, decision_interval=1, reward_scale=0.01, sim_mode="micro",
+                 snapshot_bank=None, label=None, switch_connection=True):
         super(TrafficLightEnv, self).__init__()
         
         self.net_file = net_file
@@ -28,6 +42,44 @@ class TrafficLightEnv(gym.Env):
         self.use_gui = use_gui
         self.detection_dist = detection_dist
         
+        # "micro": full microscopic model (exact, slow)
+        # "meso": SUMO mesoscopic queue model with junction control (fast, approximate)
+        if sim_mode not in ("micro", "meso"):
+            raise ValueError(f"Unknown sim_mode '{sim_mode}', expected 'micro' or 'meso'")
+        self.sim_mode = sim_mode
+        
+        # Directory made by snapshot_bank.py: episodes start from a sampled saved
+        # state instead of an empty network (states must match sim_mode)
+        self.snapshot_bank = SnapshotBank(snapshot_bank, sim_mode=sim_mode) if snapshot_bank else None
+        self.snapshot = None
+        
+        # Simulation steps (seconds) between agent decisions
+        self.decision_interval = decision_interval
+        # Multiplier on total waiting time to keep reward magnitudes manageable for PPO
+        self.reward_scale = reward_scale
+        
+        # Demand injection:
+        # None -> pass the whole route file to SUMO with -r (original behaviour)
+        # seconds -> stream the route file and inject vehicles that many seconds ahead
+        self.demand_window = demand_window
+        self.feeder = None
+        if snapshot_bank and demand_window is not None:
+            # --scale only reaches route files SUMO loads itself, and the feeder would
+            # re-add vehicles the saved state already holds
+            raise ValueError("snapshot_bank cannot be combined with demand_window; load the routes with -r instead")
+        
+        # SUMO output files to write, e.g. {"tripinfo": "out/tripinfo.xml"}.
+        # Supported kinds: tripinfo, emission, queue. Files are complete after close().
+        self.output_files = output_files or {}
+        
+        # Evaluation runs that only need observations can skip the per-step
+        # edge polling behind the reward
+        self.compute_reward = True
+        
+        # Callables run with the simulation time after every SUMO step, including
+        # the decision_interval sub-steps inside step() (e.g. per-step metrics)
+        self.step_hooks = []
+        
         # Define Action Space:
         # 0: Keep current phase
         # 1: Switch to next phase
@@ -40,35 +92,26 @@ class TrafficLightEnv(gym.Env):
         
         self.camera = None
         self.sumo_process = None
+        # TraCI connection label; give each env its own to run several in one process
+        self.label = label or "default"
+        # Make this env's connection traci's current one on start. Envs stepped from
+        # worker threads (pipeline.py) pass False and are only reached through self.conn
+        self.switch_connection = switch_connection
+        self.conn = None
         self.tls_id = None # Traffic Light ID
         
         # Check for SUMO binaries
         self._setup_sumo_paths()
 
     def _setup_sumo_paths(self):
-        # Add common SUMO paths if not in PATH
-        sumo_paths = [
-            r"C:\Program Files (x86)\Eclipse\Sumo\bin",
-            r"C:\Program Files\Eclipse\Sumo\bin"
-        ]
-        found_sumo = False
-        for path in sumo_paths:
-            if os.path.exists(path):
-                if path not in os.environ["PATH"]:
-                    os.environ["PATH"] += os.pathsep + path
-                if "SUMO_HOME" not in os.environ:
-                    os.environ["SUMO_HOME"] = os.path.dirname(path)
-                found_sumo = True
-                # break # Keep adding just in case
+        # Add common SUMO paths if not in PATH (resolved once per process)
+        ensure_sumo()
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         
         # Close existing simulation if running
-        try:
-            traci.close()
-        except Exception:
-            pass
+        self.close()
 
         # Start SUMO
         sumoBinary = "sumo-gui" if self.use_gui else "sumo"
@@ -90,47 +133,75 @@ class TrafficLightEnv(gym.Env):
         sumo_cmd = [
             sumoBinary,
             "-n", self.net_file,
-            "-r", self.route_file,
             "--no-step-log", "true",
             "--waiting-time-memory", "1000",
             "--time-to-teleport", "-1" # Disable teleport for accurate waiting time
         ]
+        if self.demand_window is None:
+            sumo_cmd.extend(["-r", self.route_file])
+        if self.sim_mode == "meso":
+            # Junction control keeps the traffic light meaningful in meso
+            sumo_cmd.extend(["--mesosim", "true", "--meso-junction-control", "true"])
+        for kind, path in self.output_files.items():
+            sumo_cmd.extend([f"--{kind}-output", path])
+        if self.snapshot_bank is not None:
+            # SUMO begins at the state's time and skips route vehicles it already holds.
+            # Same scale and seed as the generating run, so the remaining demand matches
+            self.snapshot = self.snapshot_bank.sample(self.np_random)
+            sumo_cmd.extend(["--load-state", self.snapshot["path"], "--scale", str(self.snapshot["scale"]),
+                             "--seed", str(self.snapshot["seed"])])
         
         if self.use_gui and os.path.exists("view.settings.xml"):
             sumo_cmd.extend(["--gui-settings-file", "view.settings.xml"])
         
         try:
-            traci.start(sumo_cmd)
+            with _TRACI_LOCK:
+                traci.start(sumo_cmd, label=self.label, doSwitch=self.switch_connection)
+                self.conn = traci.getConnection(self.label)
         except Exception as e:
             print(f"Error starting SUMO: {e}")
             raise e
+        
+        # Prime the just-in-time demand before the first step
+        if self.demand_window is not None:
+            if self.feeder is None:
+                self.feeder = DemandFeeder(self.route_file, window=self.demand_window)
+            self.feeder.reset(start_time=self.conn.simulation.getTime(), conn=self.conn)
+            self.feeder.update(self.conn.simulation.getTime())
             
         # Initialize Camera
         # Note: Camera init reads net file, so it doesn't depend on traci connection 
         # but get_state does.
         if self.camera is None:
-             self.camera = IntersectionCamera(net_file=self.net_file, detection_distance=50)
+             # Meso vehicles live on edge segments, not lanes, so count per edge there
+             self.camera = IntersectionCamera(net_file=self.net_file, detection_distance=50,
+                                              edge_level=(self.sim_mode == "meso"))
+        # Sensor noise follows the env seed (reset(seed=...) makes whole episodes repeatable)
+        self.camera.seed(int(self.np_random.integers(2**31)))
 
         # Get Traffic Light ID
         # Assume there is one TLS in the network
-        tls_ids = traci.trafficlight.getIDList()
+        tls_ids = self.conn.trafficlight.getIDList()
         if tls_ids:
             self.tls_id = tls_ids[0]
         else:
             print("Warning: No traffic light found in network.")
             self.tls_id = None
             
-        # Run a few steps to populate the road
-        for _ in range(5):
-             traci.simulationStep()
+        # Run a few steps to populate the road (a loaded snapshot is already busy)
+        if self.snapshot is None:
+            for _ in range(5):
+                 self.simulation_step()
              
         observation = self._get_obs()
         info = {}
+        if self.snapshot is not None:
+            info["snapshot"] = self.snapshot["file"]
         
         return observation, info
 
     def _get_obs(self):
-        state = self.camera.get_state()
+        state = self.camera.get_state(self.conn)
         return np.array(state, dtype=np.float32)
 
     def step(self, action):
@@ -141,7 +212,7 @@ class TrafficLightEnv(gym.Env):
                 # Simple logic: advance to next phase. 
                 # In SUMO, we can interpret 'next phase' as green for next direction.
                 # Or simply increment phase index.
-                current_phase = traci.trafficlight.getPhase(self.tls_id)
+                current_phase = self.conn.trafficlight.getPhase(self.tls_id)
                 # Assuming simple setup: 0=NS Green, 1=NS Yellow, 2=EW Green, 3=EW Yellow
                 # Or generated by netgenerate: usually index increments.
                 
@@ -155,39 +226,44 @@ class TrafficLightEnv(gym.Env):
                 
                 # However, we must preserve yellow light logic if we want realism.
                 # For this simplified prompt: "Switch to next phase".
-                traci.trafficlight.setPhase(self.tls_id, next_phase)
+                self.conn.trafficlight.setPhase(self.tls_id, next_phase)
             else:
                 # Action 0: Keep phase.
                 # Do we need to extend the duration?
-                # traci.trafficlight.setPhaseDuration(self.tls_id, 1000) # Extend
+                # self.conn.trafficlight.setPhaseDuration(self.tls_id, 1000) # Extend
                 pass
 
         # Run Simulation Step
         # The agent decides every step? Or every few seconds?
         # Usually RL agents act every 5-10 seconds to allow traffic to clear.
         # But for "50,000 timesteps", if we step every 1s, that's fine.
+        # decision_interval lets the agent act every N steps instead.
         
-        traci.simulationStep()
+        for _ in range(self.decision_interval):
+            self.simulation_step()
+            if self.simulation_finished():
+                break
         
         # Calculate Reward
         # "Negative sum of squares of waiting times"
         # Waiting time: accumulated waiting time of all vehicles
         
         reward = 0
-        # Get all edge IDs
-        edge_ids = traci.edge.getIDList()
-        total_waiting_time = 0
-        
-        for edge_id in edge_ids:
-            # Skip internal edges
-            if edge_id.startswith(":"):
-                continue
-            wt = traci.edge.getWaitingTime(edge_id)
-            total_waiting_time += wt
+        if self.compute_reward:
+            # Get all edge IDs
+            edge_ids = self.conn.edge.getIDList()
+            total_waiting_time = 0
             
-        # Reward: Minimize Total Waiting Time (Linear) for maximum efficiency/throughput
-        # Scale by 0.01 to keep reward magnitudes manageable for PPO
-        reward = -total_waiting_time * 0.01
+            for edge_id in edge_ids:
+                # Skip internal edges
+                if edge_id.startswith(":"):
+                    continue
+                wt = self.conn.edge.getWaitingTime(edge_id)
+                total_waiting_time += wt
+                
+            # Reward: Minimize Total Waiting Time (Linear) for maximum efficiency/throughput
+            # Scale (default 0.01) to keep reward magnitudes manageable for PPO
+            reward = -total_waiting_time * self.reward_scale
         
         # Get Observation
         observation = self._get_obs()
@@ -198,15 +274,45 @@ class TrafficLightEnv(gym.Env):
         # but for RL we usually want fixed episode length.
         terminated = False
         truncated = False
-        if traci.simulation.getMinExpectedNumber() <= 0:
+        if self.simulation_finished():
              terminated = True
              
         info = {}
         
         return observation, reward, terminated, truncated, info
 
+    def simulation_step(self):
+        """
+        Advances SUMO by one step and tops up the demand window.
+        Use this instead of traci.simulationStep() when driving the env by hand.
+        """
+        self.conn.simulationStep()
+        if self.feeder is not None or self.step_hooks:
+            sim_time = self.conn.simulation.getTime()
+            if self.feeder is not None:
+                self.feeder.update(sim_time)
+            for hook in self.step_hooks:
+                hook(sim_time)
+
+    def current_phase(self):
+        """Phase index of the traffic light (0 without one), read over this env's connection."""
+        return self.conn.trafficlight.getPhase(self.tls_id) if self.tls_id else 0
+
+    def simulation_finished(self):
+        # With a feeder, SUMO only knows about the current window of demand
+        if self.feeder is not None and not self.feeder.exhausted:
+            return False
+        return self.conn.simulation.getMinExpectedNumber() <= 0
+
     def close(self):
         try:
-            traci.close()
+            with _TRACI_LOCK:
+                # Also closes a connection left open under this label by an earlier env
+                conn = self.conn or traci.getConnection(self.label)
+                conn.close(wait=False)
+            # SUMO may take a while to exit (e.g. flushing output files); don't hold up other envs
+            if conn._process is not None:
+                conn._process.wait()
         except Exception:
             pass
+        self.conn = None
@@ -0,0 +1,281 @@
+import argparse
+import heapq
+import math
+import os
+import subprocess
+import sys
+import time
+from xml.sax.saxutils import quoteattr
+
+from sumo_setup import ensure_sumo
+
+ensure_sumo()
+
+# Cuts the simulated area down to a radius around the controlled junction(s).
+#
+# 1. Keep every edge that lies fully within `radius` metres (network distance)
+#    of a controlled junction, and let netconvert build the reduced net.
+# 2. Rewrite each route to the part inside the kept area. The vehicle departs
+#    at the boundary when it would have reached it in free flow, so arrivals
+#    at the junction keep the same timing.
+# 3. Optionally run both scenarios and compare arrivals at the junction.
+#
+#   python trim_network.py --radius 100 --out-dir trimmed --verify
+
+
+def controlled_junctions(net):
+    return [n.getID() for n in net.getNodes() if n.getType() == "traffic_light"]
+
+
+def node_distances(net, sources):
+    """Shortest network distance (either direction of travel) from the source nodes."""
+    dist = {n: 0.0 for n in sources}
+    heap = [(0.0, n) for n in sources]
+    while heap:
+        d, node_id = heapq.heappop(heap)
+        if d > dist.get(node_id, math.inf):
+            continue
+        node = net.getNode(node_id)
+        for edge in node.getIncoming() + node.getOutgoing():
+            if edge.getFunction() == "internal":
+                continue
+            other = edge.getFromNode() if edge.getToNode() is node else edge.getToNode()
+            nd = d + edge.getLength()
+            if nd < dist.get(other.getID(), math.inf):
+                dist[other.getID()] = nd
+                heapq.heappush(heap, (nd, other.getID()))
+    return dist
+
+
+def select_edges(net, junctions, radius):
+    """Edges that fit entirely inside the radius, measured from their nearer end."""
+    dist = node_distances(net, junctions)
+    keep = []
+    for edge in net.getEdges():
+        if edge.getFunction() == "internal":
+            continue
+        near = min(dist.get(edge.getFromNode().getID(), math.inf), dist.get(edge.getToNode().getID(), math.inf))
+        if near + edge.getLength() <= radius + 1e-6:
+            keep.append(edge.getID())
+    return keep
+
+
+def build_net(net_file, keep_edges, out_net):
+    edges_file = out_net + ".edges.txt"
+    with open(edges_file, "w") as f:
+        f.write("\n".join(keep_edges))
+    cmd = ["netconvert", "--sumo-net-file", net_file, "--keep-edges.input-file", edges_file,
+           "--output-file", out_net]
+    try:
+        subprocess.run(cmd, check=True)
+    except FileNotFoundError:
+        print("Error: 'netconvert' command not found. Please ensure SUMO is installed and in your PATH.")
+        sys.exit(1)
+    finally:
+        os.remove(edges_file)
+
+
+def _free_flow_time(net, edge_ids):
+    return sum(net.getEdge(e).getLength() / net.getEdge(e).getSpeed() for e in edge_ids)
+
+
+def _cut(edges, keep):
+    """First contiguous run of kept edges: (start index, kept edges) or (None, [])."""
+    start = None
+    for i, e in enumerate(edges):
+        if e in keep:
+            if start is None:
+                start = i
+        elif start is not None:
+            return start, edges[start:i]
+    if start is None:
+        return None, []
+    return start, edges[start:]
+
+
+def trim_routes(net, route_file, keep_edges, out_routes):
+    """
+    Streams the route file and writes the cut routes in departure order.
+    Departures only move later (by the free-flow time of the dropped prefix),
+    so a vehicle can be written once the input has passed its new departure
+    time; the reorder buffer stays as small as the largest shift allows.
+    Returns (vehicles kept, vehicles dropped).
+    """
+    from demand_feeder import iter_route_file
+
+    keep = set(keep_edges)
+    named_routes = {}
+    pending = []
+    kept = dropped = 0
+    order = 0
+
+    with open(out_routes, "w") as out:
+        out.write("<routes>\n")
+
+        def flush(upto):
+            while pending and pending[0][0] <= upto:
+                _, _, line = heapq.heappop(pending)
+                out.write(line)
+
+        for entry in iter_route_file(route_file):
+            kind = entry["kind"]
+            if kind == "vType":
+                attrs = " ".join(f"{k}={quoteattr(v)}" for k, v in entry.items() if k != "kind")
+                out.write(f"    <vType {attrs}/>\n")
+                continue
+            if kind == "route":
+                named_routes[entry["id"]] = entry["edges"]
+                continue
+
+            depart = float(entry.get("depart", 0))
+            flush(depart)
+            if kind == "trip":
+                path, _ = net.getShortestPath(net.getEdge(entry["from"]), net.getEdge(entry["to"]))
+                edges = [e.getID() for e in path] if path else []
+            elif "edges" in entry:
+                edges = entry["edges"]
+            else:
+                edges = named_routes.get(entry.get("route"), [])
+
+            start, cut = _cut(edges, keep)
+            if not cut:
+                dropped += 1
+                continue
+            new_depart = depart + _free_flow_time(net, edges[:start])
+            attrs = {k: v for k, v in entry.items() if k not in ("kind", "edges", "route", "from", "to", "depart")}
+            attrs["depart"] = f"{new_depart:.2f}"
+            if start > 0:
+                # Entering mid-route: come in moving, on whichever lane suits the route
+                attrs["departLane"] = "best"
+                attrs["departSpeed"] = "max"
+            attr_str = " ".join(f"{k}={quoteattr(v)}" for k, v in attrs.items())
+            line = (f"    <vehicle {attr_str}>\n"
+                    f"        <route edges={quoteattr(' '.join(cut))}/>\n"
+                    f"    </vehicle>\n")
+            heapq.heappush(pending, (new_depart, order, line))
+            order += 1
+            kept += 1
+
+        flush(math.inf)
+        out.write("</routes>\n")
+    return kept, dropped
+
+
+def junction_arrivals(net_file, route_file, junction, duration):
+    """Runs SUMO and returns (entry times onto the junction's incoming edges, wall seconds)."""
+    import traci
+    import sumolib
+
+    net = sumolib.net.readNet(net_file)
+    incoming = [e.getID() for e in net.getNode(junction).getIncoming()]
+    try:
+        binary = sumolib.checkBinary("sumo")
+    except Exception:
+        binary = "sumo"
+    traci.start([binary, "-n", net_file, "-r", route_file, "--no-step-log", "true",
+                 "--time-to-teleport", "-1"])
+    seen = set()
+    times = []
+    t0 = time.perf_counter()
+    try:
+        while traci.simulation.getTime() < duration and traci.simulation.getMinExpectedNumber() > 0:
+            traci.simulationStep()
+            now = traci.simulation.getTime()
+            for edge_id in incoming:
+                for veh in traci.edge.getLastStepVehicleIDs(edge_id):
+                    if veh not in seen:
+                        seen.add(veh)
+                        times.append(now)
+    finally:
+        wall = time.perf_counter() - t0
+        traci.close()
+    return times, wall
+
+
+def ks_statistic(a, b):
+    """Two-sample Kolmogorov-Smirnov statistic."""
+    a, b = sorted(a), sorted(b)
+    if not a or not b:
+        return math.nan
+    i = j = 0
+    d = 0.0
+    while i < len(a) and j < len(b):
+        x = min(a[i], b[j])
+        while i < len(a) and a[i] <= x:
+            i += 1
+        while j < len(b) and b[j] <= x:
+            j += 1
+        d = max(d, abs(i / len(a) - j / len(b)))
+    return d
+
+
+def verify(net_file, route_file, out_net, out_routes, junction, duration=3600, bin_size=60):
+    print("Running original scenario...")
+    orig_times, orig_wall = junction_arrivals(net_file, route_file, junction, duration)
+    print("Running trimmed scenario...")
+    trim_times, trim_wall = junction_arrivals(out_net, out_routes, junction, duration)
+
+    def binned(times):
+        counts = {}
+        for t in times:
+            counts[int(t // bin_size)] = counts.get(int(t // bin_size), 0) + 1
+        return counts
+
+    ob, tb = binned(orig_times), binned(trim_times)
+    bins = set(ob) | set(tb)
+    bin_mae = sum(abs(ob.get(k, 0) - tb.get(k, 0)) for k in bins) / max(len(bins), 1)
+    ks = ks_statistic(orig_times, trim_times)
+    # Critical value of the KS test at alpha = 0.05
+    n, m = len(orig_times), len(trim_times)
+    critical = 1.358 * math.sqrt((n + m) / (n * m)) if n and m else math.nan
+
+    print("\n" + "=" * 60)
+    print(f"             ARRIVALS AT JUNCTION {junction}")
+    print("=" * 60)
+    print(f"{'':<24} | {'Original':<12} | {'Trimmed':<12}")
+    print(f"{'Vehicles arriving':<24} | {n:<12} | {m:<12}")
+    print(f"{'Wall time (s)':<24} | {orig_wall:<12.2f} | {trim_wall:<12.2f}")
+    print("-" * 60)
+    print(f"Speedup: {orig_wall / trim_wall if trim_wall else math.nan:.1f}x")
+    print(f"Mean |difference| per {bin_size}s bin: {bin_mae:.2f} vehicles")
+    verdict = "equivalent" if ks <= critical else "DIFFERENT"
+    print(f"KS statistic on arrival times: {ks:.3f} (critical {critical:.3f}) -> {verdict}")
+    print("=" * 60)
+    return {"ks": ks, "critical": critical, "bin_mae": bin_mae, "speedup": orig_wall / trim_wall if trim_wall else math.nan}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cut the network down to a radius around the controlled junction(s).")
+    parser.add_argument("--net-file", default="intersection.net.xml")
+    parser.add_argument("--route-file", default="traffic.rou.xml")
+    parser.add_argument("--junctions", nargs="*", default=None, help="Junction IDs to keep (default: all traffic lights)")
+    parser.add_argument("--radius", type=float, default=100.0, help="Network distance (m) to keep around each junction")
+    parser.add_argument("--out-dir", default="trimmed")
+    parser.add_argument("--verify", action="store_true", help="Simulate both scenarios and compare junction arrivals")
+    parser.add_argument("--duration", type=float, default=3600, help="Simulated seconds for --verify")
+    args = parser.parse_args(argv)
+
+    import sumolib
+    net = sumolib.net.readNet(args.net_file)
+    junctions = args.junctions or controlled_junctions(net)
+    if not junctions:
+        print("Error: no traffic light junctions found; pass --junctions.")
+        sys.exit(1)
+
+    keep = select_edges(net, junctions, args.radius)
+    total = sum(1 for e in net.getEdges() if e.getFunction() != "internal")
+    print(f"Keeping {len(keep)}/{total} edges within {args.radius:.0f} m of {', '.join(junctions)}")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    out_net = os.path.join(args.out_dir, os.path.basename(args.net_file))
+    out_routes = os.path.join(args.out_dir, os.path.basename(args.route_file))
+    build_net(args.net_file, keep, out_net)
+    kept, dropped = trim_routes(net, args.route_file, keep, out_routes)
+    print(f"Routes written to {out_routes}: {kept} vehicles kept, {dropped} never enter the area")
+
+    if args.verify:
+        verify(args.net_file, args.route_file, out_net, out_routes, junctions[0], duration=args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Parallel hyperparameter search for the PPO agent.
+#
+# Trials run concurrently in a process pool (one SUMO per worker). Every trial
+# reports an intermediate cost during training; a trial is pruned when it is
+# worse than the median of the other trials at the same point (median rule).
+# Points are simulated seconds, not PPO timesteps: with decision_interval=10 a
+# timestep covers ten times as much traffic as with decision_interval=1.
+# Everything is stored in a local SQLite study, so a search can be stopped and
+# resumed, and several searches compared from the same file.
+#
+#   python tune.py --study ppo-v1 --trials 40 --jobs 4
+#   python tune.py --study ppo-v1 --show
+
+DEFAULT_DB = "flowstate_tune.db"
+
+# name -> (kind, spec)
+SEARCH_SPACE = {
+    "learning_rate": ("log", (1e-5, 1e-2)),
+    "n_steps": ("choice", [128, 256, 512, 1024, 2048]),
+    "batch_size": ("choice", [32, 64, 128, 256]),
+    "gamma": ("choice", [0.9, 0.95, 0.98, 0.99, 0.995]),
+    "decision_interval": ("choice", [1, 2, 5, 10]),
+    "reward_scale": ("log", (1e-3, 1e-1)),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    study TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    value REAL,
+    started REAL,
+    finished REAL,
+    UNIQUE (study, number)
+);
+CREATE TABLE IF NOT EXISTS intermediates (
+    trial_id INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (trial_id, step)
+);
+"""
+
+
+def sample_params(rng):
+    params = {}
+    for name, (kind, spec) in SEARCH_SPACE.items():
+        if kind == "log":
+            low, high = spec
+            params[name] = math.exp(rng.uniform(math.log(low), math.log(high)))
+        else:
+            params[name] = rng.choice(spec)
+    # SB3 wants the rollout buffer to split into whole minibatches
+    params["batch_size"] = min(params["batch_size"], params["n_steps"])
+    return params
+
+
+class Study:
+    """
+    A named set of trials in a SQLite file. Each process opens its own
+    connection; SQLite's locking makes concurrent reports from workers safe.
+    Lower values are better (values are waiting-time costs).
+    """
+    def __init__(self, db_path, name):
+        self.db_path = db_path
+        self.name = name
+        self.conn = sqlite3.connect(db_path, timeout=60)
+        self.conn.executescript(SCHEMA)
+
+    def mark_stale_failed(self):
+        # Trials left 'running' by an interrupted search are not coming back
+        with self.conn:
+            self.conn.execute("UPDATE trials SET state = 'failed' WHERE study = ? AND state = 'running'",
+                              (self.name,))
+
+    def count(self, states=("complete", "pruned")):
+        marks = ",".join("?" * len(states))
+        row = self.conn.execute(f"SELECT COUNT(*) FROM trials WHERE study = ? AND state IN ({marks})",
+                                (self.name, *states)).fetchone()
+        return row[0]
+
+    def next_number(self):
+        row = self.conn.execute("SELECT MAX(number) FROM trials WHERE study = ?", (self.name,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def create_trial(self, number, params):
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO trials (study, number, params, state, started) VALUES (?, ?, ?, 'running', ?)",
+                (self.name, number, json.dumps(params), time.time()))
+        return cur.lastrowid
+
+    def report(self, trial_id, step, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO intermediates (trial_id, step, value) VALUES (?, ?, ?)",
+                              (trial_id, step, value))
+
+    def should_prune(self, trial_id, step, value, min_trials=3):
+        """Median rule: prune if worse than the median of other trials at this step."""
+        rows = self.conn.execute(
+            "SELECT i.value FROM intermediates i JOIN trials t ON t.id = i.trial_id "
+            "WHERE t.study = ? AND i.step = ? AND i.trial_id != ?",
+            (self.name, step, trial_id)).fetchall()
+        if len(rows) < min_trials:
+            return False
+        values = sorted(r[0] for r in rows)
+        mid = len(values) // 2
+        median = values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+        return value > median
+
+    def finish(self, trial_id, state, value=None):
+        with self.conn:
+            self.conn.execute("UPDATE trials SET state = ?, value = ?, finished = ? WHERE id = ?",
+                              (state, value, time.time(), trial_id))
+
+    def trials(self):
+        rows = self.conn.execute(
+            "SELECT number, state, value, params, started, finished FROM trials WHERE study = ? ORDER BY number",
+            (self.name,)).fetchall()
+        return [{"number": r[0], "state": r[1], "value": r[2], "params": json.loads(r[3]),
+                 "duration": (r[5] - r[4]) if r[5] and r[4] else None} for r in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def run_trial(db_path, study_name, trial_id, number, params, total_timesteps, report_every, model_dir):
+    """Worker entry point: train one configuration, reporting to the study as it goes."""
+    # Heavy imports happen in the worker only
+    from sumo_setup import ensure_sumo
+    ensure_sumo()
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.callbacks import BaseCallback
+    from traffic_env import TrafficLightEnv
+    from step4_evaluate import run_simulation_metrics
+
+    study = Study(db_path, study_name)
+
+    class PruningCallback(BaseCallback):
+        """
+        Reports the mean waiting-time cost every report_every simulated seconds
+        (timesteps * decision_interval); stops training if pruned.
+        """
+        def __init__(self):
+            super().__init__()
+            self.costs = []
+            self.pruned = False
+            self.next_report = report_every
+
+        def _on_step(self):
+            # Undo the trial's reward scale so costs compare across trials
+            for r in self.locals["rewards"]:
+                self.costs.append(-r / params["reward_scale"])
+            sim_seconds = self.num_timesteps * params["decision_interval"]
+            if sim_seconds >= self.next_report and self.costs:
+                # Keyed by the checkpoint, so trials with any interval meet at the same steps
+                checkpoint = self.next_report
+                self.next_report += report_every * ((sim_seconds - checkpoint) // report_every + 1)
+                value = sum(self.costs) / len(self.costs)
+                self.costs = []
+                study.report(trial_id, checkpoint, value)
+                if study.should_prune(trial_id, checkpoint, value):
+                    self.pruned = True
+                    return False
+            return True
+
+    env = TrafficLightEnv(net_file="intersection.net.xml", route_file="traffic.rou.xml", use_gui=False,
+                          decision_interval=params["decision_interval"], reward_scale=params["reward_scale"])
+    try:
+        model = PPO("MlpPolicy", env, learning_rate=params["learning_rate"], n_steps=params["n_steps"],
+                    batch_size=params["batch_size"], gamma=params["gamma"], seed=number, verbose=0)
+        callback = PruningCallback()
+        model.learn(total_timesteps=total_timesteps, callback=callback)
+        if callback.pruned:
+            study.finish(trial_id, "pruned")
+            return number, "pruned", None
+
+        # Final score: per-vehicle average wait from the step4 evaluation
+        avg_wait, _, _, _, _ = run_simulation_metrics(env, model=model, label=f"Trial {number}")
+        if model_dir:
+            os.makedirs(model_dir, exist_ok=True)
+            model.save(os.path.join(model_dir, f"trial_{number}"))
+        study.finish(trial_id, "complete", avg_wait)
+        return number, "complete", avg_wait
+    except Exception as e:
+        print(f"Trial {number} failed: {e}")
+        study.finish(trial_id, "failed")
+        return number, "failed", None
+    finally:
+        env.close()
+        study.close()
+
+
+def search(db_path, study_name, n_trials, n_jobs, total_timesteps, report_every, seed, model_dir, max_failures=3):
+    """
+    Runs trials until n_trials have finished (complete or pruned). Failed
+    trials do not count; after max_failures failures in a row (e.g. SUMO or
+    SB3 missing in the workers) no new trials are started.
+    """
+    study = Study(db_path, study_name)
+    study.mark_stale_failed()
+    done = study.count()
+    if done >= n_trials:
+        print(f"Study '{study_name}' already has {done} finished trials.")
+        return study
+
+    print(f"Study '{study_name}': {done}/{n_trials} trials finished, running the rest on {n_jobs} workers...")
+    running = {}
+    failures = 0
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        while done + len(running) < n_trials or running:
+            while done + len(running) < n_trials and len(running) < n_jobs and failures < max_failures:
+                number = study.next_number()
+                # Seeded per trial number so a resumed search samples the same sequence
+                params = sample_params(random.Random(f"{seed}-{number}"))
+                trial_id = study.create_trial(number, params)
+                future = pool.submit(run_trial, db_path, study_name, trial_id, number, params,
+                                     total_timesteps, report_every, model_dir)
+                running[future] = number
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                running.pop(future)
+                number, state, value = future.result()
+                if state != "failed":
+                    done += 1
+                    failures = 0
+                else:
+                    failures += 1
+                shown = f"{value:.2f}" if value is not None else "-"
+                print(f"Trial {number}: {state} (avg wait {shown})  [{done}/{n_trials}]")
+            if failures >= max_failures and not running:
+                break
+    if failures >= max_failures:
+        print(f"Stopped: {failures} trials failed in a row. Check the trial errors above, then resume the study.")
+    return study
+
+
+def show(study):
+    trials = study.trials()
+    complete = sorted((t for t in trials if t["state"] == "complete"), key=lambda t: t["value"])
+    print("=" * 90)
+    print(f"Study '{study.name}': {len(trials)} trials, "
+          f"{len(complete)} complete, {sum(t['state'] == 'pruned' for t in trials)} pruned")
+    print("-" * 90)
+    print(f"{'#':<4} | {'Avg Wait':<9} | {'lr':<9} | {'n_steps':<7} | {'batch':<5} | {'gamma':<6} | {'interval':<8} | {'scale':<7}")
+    for t in complete[:10]:
+        p = t["params"]
+        print(f"{t['number']:<4} | {t['value']:<9.2f} | {p['learning_rate']:<9.2e} | {p['n_steps']:<7} | "
+              f"{p['batch_size']:<5} | {p['gamma']:<6} | {p['decision_interval']:<8} | {p['reward_scale']:<7.4f}")
+    print("=" * 90)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel PPO hyperparameter search with median pruning.")
+    parser.add_argument("--study", default="ppo", help="Study name (resumes if it already exists)")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite file holding the studies")
+    parser.add_argument("--trials", type=int, default=20, help="Total finished trials wanted")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="Concurrent trials")
+    parser.add_argument("--timesteps", type=int, default=20000, help="Training timesteps per trial")
+    parser.add_argument("--report-every", type=int, default=2000, help="Simulated seconds between pruning checks")
+    parser.add_argument("--max-failures", type=int, default=3, help="Stop after this many trials fail in a row")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-dir", default=None, help="Save each completed trial's model here")
+    parser.add_argument("--show", action="store_true", help="Only print the study leaderboard")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        study = Study(args.db, args.study)
+    else:
+        study = search(args.db, args.study, args.trials, args.jobs, args.timesteps,
+                       args.report_every, args.seed, args.model_dir, max_failures=args.max_failures)
+    show(study)
+    study.close()
+
+
+if __name__ == "__main__":
+    main()